@@ -0,0 +1,63 @@
+"""Run every benchmark and write the results as JSON, for comparison between runs.
+
+uv run --group bench python -m benchmarks --output results.json
+"""
+
+import datetime
+import json
+import platform
+import subprocess
+from pathlib import Path
+from typing import Any
+
+import typer
+
+from benchmarks import end_to_end, enqueue, scan, webhook
+
+app = typer.Typer()
+
+
+def _revision() -> str | None:
+    result = subprocess.run(
+        ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True
+    )
+    return result.stdout.strip() if result.returncode == 0 else None
+
+
+@app.command()
+def main(
+    output: Path = Path("benchmark-results.json"),
+    files: int = 5000,
+    jobs: int = 2000,
+    requests: int = 1000,
+    transcodes: int = 100,
+    latency: float = 0.0,
+    ffmpeg_latency: float = 0.0,
+) -> None:
+    parameters = {
+        "files": files,
+        "jobs": jobs,
+        "requests": requests,
+        "transcodes": transcodes,
+        "latency_ms": latency,
+        "ffmpeg_latency_ms": ffmpeg_latency,
+    }
+    results: dict[str, Any] = {
+        "timestamp": datetime.datetime.now(datetime.UTC).isoformat(),
+        "revision": _revision(),
+        "python": platform.python_version(),
+        "parameters": parameters,
+        "scan": scan.run(files, latency),
+        "enqueue": enqueue.run(jobs, latency, batch_size=500),
+        "webhook": webhook.run(requests, concurrency=24, latency_ms=latency),
+        "end_to_end": end_to_end.run(transcodes, ffmpeg_latency, latency),
+    }
+    output.write_text(json.dumps(results, indent=2) + "\n")
+    for benchmark in ("scan", "enqueue", "webhook", "end_to_end"):
+        for name, value in results[benchmark].items():
+            typer.echo(f"{benchmark}.{name}: {value:,.1f}")
+    typer.echo(f"Wrote {output}")
+
+
+if __name__ == "__main__":
+    app()
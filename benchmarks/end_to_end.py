@@ -0,0 +1,103 @@
+"""End-to-end transcodes per second, from enqueue to finalized output.
+
+Jobs run through the probe and encode stages on an in-process RQ worker, with
+stub ffmpeg and ffprobe on PATH and fakeredis in place of Redis. ``--ffmpeg-
+latency`` is how long each stub call takes; ``--latency`` adds a simulated
+network round trip to every Redis command (or pipeline).
+
+    uv run --group bench python -m benchmarks.end_to_end --jobs 200
+"""
+
+import os
+import tempfile
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any
+
+import typer
+from rq import Queue, SimpleWorker
+
+from benchmarks.fakes import fake_binaries, fake_redis, rq_client
+from benchmarks.scan import make_library
+from domain.constants import MediaType, Priority, Stage
+from domain.media_type import MediaTypeResolver
+from interfaces.library_index import LibraryIndex
+from interfaces.probe_cache import ProbeCache
+from interfaces.result_store import ResultStore
+from interfaces.rq import queue_name
+from transcoder.dependencies import Dependencies
+from transcoder.settings import settings
+
+app = typer.Typer()
+
+
+@contextmanager
+def _settings(**overrides: Any) -> Iterator[None]:
+    previous = {name: getattr(settings, name) for name in overrides}
+    for name, value in overrides.items():
+        setattr(settings, name, value)
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            setattr(settings, name, value)
+
+
+def run(jobs: int, ffmpeg_latency_ms: float, latency_ms: float) -> dict[str, float]:
+    with tempfile.TemporaryDirectory() as directory:
+        root = Path(directory)
+        library, cache = root / "library", root / "cache"
+        paths = make_library(library, jobs)
+        connection = fake_redis(latency_ms)
+        client = rq_client(connection)
+        dependencies = Dependencies()
+        dependencies.rq_client.override(client)
+        dependencies.media_type_resolver.override(
+            MediaTypeResolver({library: MediaType.MOVIE})
+        )
+        dependencies.probe_cache.override(ProbeCache(cache / "probe.sqlite3"))
+        dependencies.library_index.override(LibraryIndex(cache / "library.sqlite3"))
+        dependencies.result_store.override(ResultStore(cache / "results.sqlite3"))
+        dependencies.wire(packages=["service"])
+        queues = [
+            Queue(queue_name(stage, priority), connection=connection)
+            for priority in Priority
+            for stage in Stage
+        ]
+        try:
+            with (
+                fake_binaries(root / "bin", ffmpeg_latency_ms),
+                _settings(
+                    cache_dir=cache,
+                    lock_dir=cache / "locks",
+                    scratch_dir=None,
+                    staging_dir=None,
+                    puid=os.getuid(),
+                    pgid=os.getgid(),
+                ),
+            ):
+                start = time.perf_counter()
+                client.enqueue_transcodes((path, None) for path in paths)
+                SimpleWorker(queues, connection=connection).work(
+                    burst=True, logging_level="WARNING"
+                )
+                elapsed = time.perf_counter() - start
+        finally:
+            dependencies.unwire()
+        done = sum(path.with_suffix(".mp4").exists() for path in paths)
+        if done != jobs:
+            raise RuntimeError(f"Transcoded {done} of {jobs} files")
+    return {"jobs_per_s": jobs / elapsed}
+
+
+@app.command()
+def main(jobs: int = 100, ffmpeg_latency: float = 0.0, latency: float = 0.0) -> None:
+    results = run(jobs, ffmpeg_latency, latency)
+    for name, value in results.items():
+        typer.echo(f"{name}: {value:,.1f}")
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,50 @@
+"""Per-job vs batched enqueue throughput through RQClient.
+
+Runs against fakeredis, so no Redis server is needed. ``--latency`` adds a
+simulated network round trip to every command (or pipeline) sent to it.
+
+    uv run --group bench python -m benchmarks.enqueue --jobs 5000 --latency 0.5
+"""
+
+import time
+from pathlib import Path
+
+import typer
+
+from benchmarks.fakes import fake_redis, rq_client
+from domain.constants import MediaType
+
+app = typer.Typer()
+
+
+def _videos(jobs: int) -> list[tuple[Path, MediaType | None]]:
+    return [
+        (Path(f"/data/media/TV Shows/Show/Season 1/{i}.mkv"), MediaType.TV)
+        for i in range(jobs)
+    ]
+
+
+def run(jobs: int, latency_ms: float, batch_size: int) -> dict[str, float]:
+    client = rq_client(fake_redis(latency_ms))
+    start = time.perf_counter()
+    for path, media_type in _videos(jobs):
+        client.enqueue_transcode(path, media_type)
+    per_job = jobs / (time.perf_counter() - start)
+
+    client = rq_client(fake_redis(latency_ms))
+    start = time.perf_counter()
+    client.enqueue_transcodes(_videos(jobs), batch_size=batch_size)
+    batched = jobs / (time.perf_counter() - start)
+
+    return {"per_job_jobs_per_s": per_job, "batched_jobs_per_s": batched}
+
+
+@app.command()
+def main(jobs: int = 2000, latency: float = 0.0, batch_size: int = 500) -> None:
+    results = run(jobs, latency, batch_size)
+    for name, value in results.items():
+        typer.echo(f"{name}: {value:,.0f}")
+
+
+if __name__ == "__main__":
+    app()
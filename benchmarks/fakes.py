@@ -0,0 +1,143 @@
+"""Stand-ins for Redis, ffmpeg and ffprobe, so benchmarks need none of them."""
+
+import asyncio
+import json
+import os
+import shlex
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any
+
+from fakeredis import FakeRedis, FakeRedisConnection, FakeServer
+from fakeredis.aioredis import FakeAsyncRedisConnection
+from fakeredis.aioredis import FakeRedis as FakeAsyncRedis
+
+from interfaces.rq import AsyncRQClient, RQClient
+from transcoder.settings import settings
+
+# A 1080p H.264 movie over its target bit rate, so it is planned for an encode
+PROBE_RESPONSE: dict[str, Any] = {
+    "streams": [
+        {
+            "index": 0,
+            "codec_type": "video",
+            "codec_name": "h264",
+            "width": 1920,
+            "height": 1080,
+            "bit_rate": "9000000",
+        },
+        {"index": 1, "codec_type": "audio", "codec_name": "dts"},
+        {
+            "index": 2,
+            "codec_type": "subtitle",
+            "codec_name": "subrip",
+            "tags": {"language": "eng"},
+        },
+    ],
+    "format": {"bit_rate": "10000000", "duration": "5400.0"},
+}
+
+_FFPROBE = """#!/bin/sh
+sleep {latency}
+cat {response}
+"""
+
+# Lists one software encoder, accepts the encoder test, and otherwise writes a
+# few bytes to the output path (the last argument) after reporting progress
+_FFMPEG = """#!/bin/sh
+case "$*" in
+  *-encoders*)
+    printf ' V....D libx265              libx265 H.265 / HEVC\\n'
+    exit 0;;
+  *"-f null -"*)
+    exit 0;;
+esac
+sleep {latency}
+for output; do :; done
+printf 'frame=1\\nout_time_us=1000000\\nprogress=end\\n'
+printf 'encoded' > "$output"
+"""
+
+
+class LatencyConnection(FakeRedisConnection):
+    latency = 0.0
+
+    def send_packed_command(self, command: Any, check_health: bool = True) -> None:
+        time.sleep(self.latency)
+        super().send_packed_command(command, check_health)
+
+
+class AsyncLatencyConnection(FakeAsyncRedisConnection):
+    latency = 0.0
+
+    async def send_packed_command(
+        self, command: Any, check_health: bool = True
+    ) -> None:
+        await asyncio.sleep(self.latency)
+        await super().send_packed_command(command, check_health)
+
+
+def _with_latency[C](connection_class: type[C], latency_ms: float) -> type[C]:
+    return type("Connection", (connection_class,), {"latency": latency_ms / 1000})
+
+
+def fake_redis(latency_ms: float = 0.0, server: FakeServer | None = None) -> FakeRedis:
+    """A Redis client that adds latency_ms to every command or pipeline it sends."""
+    return FakeRedis(
+        server=server or FakeServer(),
+        connection_class=_with_latency(LatencyConnection, latency_ms),
+    )
+
+
+def rq_client(connection: FakeRedis) -> RQClient:
+    return RQClient(connection, timeout=600, probe_timeout=60, inflight_ttl=600)
+
+
+def async_rq_client(latency_ms: float = 0.0) -> AsyncRQClient:
+    """An AsyncRQClient, and the RQClient it builds jobs with, on one fake server."""
+    server = FakeServer()
+    return AsyncRQClient(
+        FakeAsyncRedis(
+            server=server,
+            connection_class=_with_latency(AsyncLatencyConnection, latency_ms),
+        ),
+        rq_client(fake_redis(latency_ms, server)),
+        inflight_ttl=600,
+    )
+
+
+@contextmanager
+def fake_binaries(
+    directory: Path,
+    latency_ms: float = 0.0,
+    probe_response: dict[str, Any] | None = None,
+) -> Iterator[None]:
+    """Put stub ffmpeg and ffprobe executables first on PATH.
+
+    Each call sleeps for latency_ms, and ffprobe prints probe_response.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    response = directory / "ffprobe.json"
+    response.write_text(json.dumps(probe_response or PROBE_RESPONSE))
+    latency = f"{latency_ms / 1000:.4f}"
+    for name, script in (
+        (
+            "ffprobe",
+            _FFPROBE.format(latency=latency, response=shlex.quote(str(response))),
+        ),
+        ("ffmpeg", _FFMPEG.format(latency=latency)),
+    ):
+        (directory / name).write_text(script)
+        (directory / name).chmod(0o755)
+    path = os.environ.get("PATH", "")
+    binaries = settings.ffmpeg_binary, settings.ffprobe_binary
+    os.environ["PATH"] = f"{directory}{os.pathsep}{path}"
+    # Looked up on PATH, whatever the environment configures
+    settings.ffmpeg_binary, settings.ffprobe_binary = "ffmpeg", "ffprobe"
+    try:
+        yield
+    finally:
+        os.environ["PATH"] = path
+        settings.ffmpeg_binary, settings.ffprobe_binary = binaries
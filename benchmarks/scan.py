@@ -0,0 +1,68 @@
+"""Scan rate of convert_directory over a synthetic library.
+
+Builds a tree of small video files in a temporary directory and enqueues them
+into fakeredis. ``--latency`` adds a simulated network round trip to every
+command (or pipeline) sent to Redis.
+
+    uv run --group bench python -m benchmarks.scan --files 20000
+"""
+
+import tempfile
+import time
+from pathlib import Path
+
+import typer
+from rq import Queue
+
+from benchmarks.fakes import fake_redis, rq_client
+from domain.constants import MediaType, Priority, Stage
+from interfaces.cli.convert_directory import convert_directory
+from interfaces.rq import queue_name
+from transcoder.dependencies import Dependencies
+
+app = typer.Typer()
+
+
+def make_library(directory: Path, files: int, per_directory: int = 25) -> list[Path]:
+    """files distinct videos, laid out as shows of seasons of episodes."""
+    paths = []
+    for i in range(files):
+        show = directory / f"Show {i // (per_directory * 10)}"
+        season = show / f"Season {i // per_directory % 10}"
+        season.mkdir(parents=True, exist_ok=True)
+        path = season / f"Episode {i}.mkv"
+        # Distinct contents, so no file is another's duplicate
+        path.write_bytes(i.to_bytes(8))
+        paths.append(path)
+    return paths
+
+
+def run(files: int, latency_ms: float) -> dict[str, float]:
+    with tempfile.TemporaryDirectory() as directory:
+        library = Path(directory)
+        make_library(library, files)
+        connection = fake_redis(latency_ms)
+        dependencies = Dependencies()
+        dependencies.rq_client.override(rq_client(connection))
+        dependencies.wire(packages=["service"])
+        try:
+            start = time.perf_counter()
+            convert_directory(library, MediaType.TV)
+            elapsed = time.perf_counter() - start
+        finally:
+            dependencies.unwire()
+        queue = Queue(queue_name(Stage.PROBE, Priority.NORMAL), connection=connection)
+        if queue.count != files:
+            raise RuntimeError(f"Enqueued {queue.count} of {files} files")
+    return {"files_per_s": files / elapsed}
+
+
+@app.command()
+def main(files: int = 5000, latency: float = 0.0) -> None:
+    results = run(files, latency)
+    for name, value in results.items():
+        typer.echo(f"{name}: {value:,.0f}")
+
+
+if __name__ == "__main__":
+    app()
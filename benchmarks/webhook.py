@@ -0,0 +1,86 @@
+"""Webhook requests per second, and how fast the ingest buffer drains to Redis.
+
+Drives the FastAPI app in-process over httpx's ASGI transport against fakeredis,
+so no server or Redis is needed. ``--latency`` adds a simulated network round
+trip to every command (or pipeline) sent to Redis.
+
+    uv run --group bench python -m benchmarks.webhook --requests 2000 --latency 0.5
+"""
+
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+
+import httpx
+import typer
+
+from benchmarks.fakes import async_rq_client
+from interfaces.api import create_app
+from interfaces.ingest_buffer import IngestBuffer
+from transcoder.dependencies import Dependencies
+
+app = typer.Typer()
+
+
+def _payload(series: Path, i: int) -> dict[str, Any]:
+    return {
+        "eventType": "Download",
+        "series": {"path": str(series)},
+        "episodeFile": {"path": str(series / f"{i}.mkv")},
+    }
+
+
+async def _send(
+    series: Path, requests: int, concurrency: int, buffer: IngestBuffer
+) -> dict[str, float]:
+    transport = httpx.ASGITransport(app=create_app())
+    semaphore = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+
+        async def send(i: int) -> None:
+            async with semaphore:
+                response = await client.post(
+                    "/webhook/sonarr", json=_payload(series, i)
+                )
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(send(i) for i in range(requests)))
+        acknowledged = time.perf_counter()
+        await buffer.aclose()
+        flushed = time.perf_counter()
+    return {
+        "requests_per_s": requests / (acknowledged - start),
+        "flush_jobs_per_s": requests / (flushed - acknowledged),
+    }
+
+
+def run(requests: int, concurrency: int, latency_ms: float) -> dict[str, float]:
+    with tempfile.TemporaryDirectory() as directory:
+        series = Path(directory)
+        for i in range(requests):
+            (series / f"{i}.mkv").touch()
+        # The app is driven without its lifespan, so the buffer only flushes on close
+        buffer = IngestBuffer(async_rq_client(latency_ms), debounce=60, max_delay=60)
+        dependencies = Dependencies()
+        dependencies.ingest_buffer.override(buffer)
+        dependencies.wire(packages=["service"])
+        try:
+            return asyncio.run(_send(series, requests, concurrency, buffer))
+        finally:
+            dependencies.unwire()
+
+
+@app.command()
+def main(requests: int = 1000, concurrency: int = 24, latency: float = 0.0) -> None:
+    results = run(requests, concurrency, latency)
+    for name, value in results.items():
+        typer.echo(f"{name}: {value:,.0f}")
+
+
+if __name__ == "__main__":
+    app()
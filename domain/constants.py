@@ -5,3 +5,33 @@ class MediaType(StrEnum):
     TV = "tv"
     MOVIE = "movie"
     ANIMATION = "animation"
+
+
+class TranscodeDecision(StrEnum):
+    SKIPPED = "skipped"
+    TRANSCODED = "transcoded"
+
+
+class Stage(StrEnum):
+    PROBE = "probe"
+    REMUX = "remux"
+    ENCODE = "encode"
+
+
+class Priority(StrEnum):
+    HIGH = "high"
+    NORMAL = "normal"
+
+
+class OrderingPolicy(StrEnum):
+    SCAN = "scan"
+    SMALLEST_FIRST = "smallest-first"
+    CHEAPEST_FIRST = "cheapest-first"
+    ROUND_ROBIN = "round-robin"
+
+
+class FailureReason(StrEnum):
+    TIMEOUT = "timeout"
+    STALLED = "stalled"
+    EXIT_CODE = "exit-code"
+    ERROR = "error"
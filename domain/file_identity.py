@@ -0,0 +1,24 @@
+import os
+from dataclasses import dataclass
+from pathlib import Path
+
+
+@dataclass(frozen=True)
+class FileIdentity:
+    device: int
+    inode: int
+    size: int
+    mtime_ns: int
+
+    @classmethod
+    def from_stat(cls, stat: os.stat_result) -> "FileIdentity":
+        return cls(
+            device=stat.st_dev,
+            inode=stat.st_ino,
+            size=stat.st_size,
+            mtime_ns=stat.st_mtime_ns,
+        )
+
+    @classmethod
+    def from_path(cls, path: Path) -> "FileIdentity":
+        return cls.from_stat(path.stat())
@@ -0,0 +1,46 @@
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+from pathlib import PurePath
+from typing import overload
+
+from domain.constants import MediaType
+
+
+@dataclass
+class _Node:
+    children: dict[str, "_Node"] = field(default_factory=dict)
+    media_type: MediaType | None = None
+
+
+class MediaTypeResolver:
+    """Maps a path to the media type of the deepest library root containing it.
+
+    Roots are stored in a trie over path components, so a lookup costs one
+    step per component of the path however the libraries are mounted.
+    """
+
+    def __init__(self, libraries: Mapping[PurePath, MediaType]) -> None:
+        self._root = _Node()
+        for root, media_type in libraries.items():
+            node = self._root
+            for part in PurePath(root).parts:
+                node = node.children.setdefault(part, _Node())
+            node.media_type = media_type
+
+    @overload
+    def resolve(self, path: PurePath) -> MediaType | None: ...
+
+    @overload
+    def resolve(self, path: PurePath, default: MediaType) -> MediaType: ...
+
+    def resolve(
+        self, path: PurePath, default: MediaType | None = None
+    ) -> MediaType | None:
+        node = self._root
+        media_type = node.media_type
+        for part in path.parts:
+            if (child := node.children.get(part)) is None:
+                break
+            node = child
+            media_type = node.media_type or media_type
+        return media_type or default
@@ -0,0 +1,80 @@
+from dataclasses import dataclass
+
+import numpy as np
+import numpy.typing as npt
+
+from domain.constants import MediaType
+from domain.transcode import (
+    BITRATE_TOLERANCE,
+    TARGET_BITRATES,
+    TARGET_EXTENSION,
+    TARGET_WIDTH,
+)
+
+# transcode_stages codes, one per file
+SKIP = 0
+REMUX = 1
+ENCODE = 2
+
+
+@dataclass(frozen=True)
+class LibraryColumns:
+    """Probe records for a whole library, one array per field."""
+
+    media_types: npt.NDArray[np.str_]
+    extensions: npt.NDArray[np.str_]
+    widths: npt.NDArray[np.int64]
+    bit_rates: npt.NDArray[np.int64]
+    # NaN where the duration is unknown
+    durations: npt.NDArray[np.float64]
+
+
+@dataclass(frozen=True)
+class PlanSummary:
+    files: int
+    skip: int
+    remux: int
+    encode: int
+    # Media seconds to encode; wall time depends on the encoder
+    encode_seconds: float
+    saved_bytes: int
+
+
+def _target_rates(columns: LibraryColumns) -> npt.NDArray[np.float64]:
+    rates = np.zeros(len(columns.media_types))
+    for media_type, rate in TARGET_BITRATES.items():
+        rates[columns.media_types == media_type] = rate
+    # Truncated like target_bitrate
+    return np.floor(columns.widths / TARGET_WIDTH * rates)
+
+
+def transcode_stages(columns: LibraryColumns) -> npt.NDArray[np.int8]:
+    """transcode_stage over every file at once, as SKIP, REMUX or ENCODE codes."""
+    encode = columns.bit_rates >= _target_rates(columns) * BITRATE_TOLERANCE
+    extensions = np.char.lstrip(np.char.lower(columns.extensions), ".")
+    remux = extensions != TARGET_EXTENSION
+    return np.where(encode, ENCODE, np.where(remux, REMUX, SKIP)).astype(np.int8)
+
+
+def summarize(columns: LibraryColumns) -> dict[MediaType, PlanSummary]:
+    """What transcoding the library would do, per media type.
+
+    Savings assume each encode comes out at its target bit rate. Files without
+    a known duration count towards neither encode time nor savings.
+    """
+    stages = transcode_stages(columns)
+    durations = np.nan_to_num(columns.durations)
+    saved_bits = (columns.bit_rates - _target_rates(columns)) * durations
+    summaries = {}
+    for media_type in MediaType:
+        selected = columns.media_types == media_type
+        encode = selected & (stages == ENCODE)
+        summaries[media_type] = PlanSummary(
+            files=int(selected.sum()),
+            skip=int((selected & (stages == SKIP)).sum()),
+            remux=int((selected & (stages == REMUX)).sum()),
+            encode=int(encode.sum()),
+            encode_seconds=float(durations[encode].sum()),
+            saved_bytes=int(saved_bits[encode].sum() / 8),
+        )
+    return summaries
@@ -0,0 +1,117 @@
+from domain.constants import MediaType, Stage
+
+# Planned params name the target codec; the encoding node picks the encoder
+ENCODE_CODEC = "hevc"
+
+TARGET_EXTENSION = "mp4"
+# Target bit rates are for this width, and scale linearly with it
+TARGET_WIDTH = 1920
+TARGET_BITRATES = {
+    MediaType.TV: 2000000,
+    MediaType.MOVIE: 4000000,
+    MediaType.ANIMATION: 1000000,
+}
+# Files this close to their target aren't worth re-encoding
+BITRATE_TOLERANCE = 1.05
+
+# Subtitle codecs ffmpeg can convert to mov_text; anything else is image based
+TEXT_SUBTITLE_CODECS = frozenset(
+    {
+        "ass",
+        "mov_text",
+        "ssa",
+        "subrip",
+        "text",
+        "webvtt",
+    }
+)
+
+
+def stage_for(params: dict[str, str]) -> Stage:
+    return Stage.REMUX if params["c:v"] == "copy" else Stage.ENCODE
+
+
+def target_bitrate(media_type: MediaType, width: int) -> int:
+    return int(width / TARGET_WIDTH * TARGET_BITRATES[media_type])
+
+
+def needs_encode(bit_rate: int, target_rate: int) -> bool:
+    return bit_rate >= target_rate * BITRATE_TOLERANCE
+
+
+def is_target_extension(extension: str) -> bool:
+    return extension.lower().lstrip(".") == TARGET_EXTENSION
+
+
+def transcode_stage(
+    extension: str, media_type: MediaType, width: int, bit_rate: int
+) -> Stage | None:
+    """Encode anything over its target bit rate, remux the rest unless already mp4.
+
+    None means the file is left as it is.
+    """
+    if needs_encode(bit_rate, target_bitrate(media_type, width)):
+        return Stage.ENCODE
+    if is_target_extension(extension):
+        return None
+    return Stage.REMUX
+
+
+def meets_target(
+    extension: str, media_type: MediaType, width: int, bit_rate: int
+) -> bool:
+    """Whether a file would be skipped outright: already mp4 and within its bit rate."""
+    return transcode_stage(extension, media_type, width, bit_rate) is None
+
+
+# Flags that apply to the whole output rather than to the video stream
+_CONTAINER_FLAGS = ("c:a", "c:s", "movflags")
+
+
+def should_segment(
+    media_type: MediaType, duration: float | None, min_duration: float, count: int
+) -> bool:
+    return (
+        media_type == MediaType.MOVIE
+        and count > 1
+        and duration is not None
+        and duration >= min_duration
+    )
+
+
+def segment_times(duration: float, count: int) -> list[float]:
+    """Evenly spaced split points, before they are moved to keyframes."""
+    return [duration * i / count for i in range(1, count)]
+
+
+def segment_params(params: dict[str, str]) -> dict[str, str]:
+    return {
+        flag: value for flag, value in params.items() if flag not in _CONTAINER_FLAGS
+    }
+
+
+def concat_params(params: dict[str, str]) -> dict[str, str]:
+    return {"c:v": "copy"} | {
+        flag: value for flag, value in params.items() if flag in _CONTAINER_FLAGS
+    }
+
+
+def format_rate(rate: int) -> str:
+    return str(int(rate / 1000)) + "k"
+
+
+def parse_rate(rate: str) -> int:
+    return int(rate.removesuffix("k")) * 1000
+
+
+def is_text_subtitle(codec_name: str) -> bool:
+    return codec_name in TEXT_SUBTITLE_CODECS
+
+
+def time_limit(
+    duration: float | None, factor: float, minimum: float, maximum: float
+) -> float:
+    """Wall-clock budget for processing media of the given duration in seconds."""
+    if duration is None:
+        return maximum
+    return min(max(duration * factor, minimum), maximum)
@@ -3,6 +3,8 @@ from typing import AsyncGenerator
 
 from fastapi import FastAPI
 from interfaces.api.webhook import router as webhook_router
+from service.arr_library import close_arr_clients
+from service.ingest import start_ingest, stop_ingest
 from transcoder.events import on_startup, on_shutdown
 from transcoder.observability import instrument_fastapi
 
@@ -10,7 +12,10 @@ from transcoder.observability import instrument_fastapi
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncGenerator[None]:
     on_startup()
+    start_ingest()
     yield
+    await stop_ingest()
+    await close_arr_clients()
     on_shutdown()
 
 
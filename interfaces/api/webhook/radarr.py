@@ -1,7 +1,7 @@
 import logging
 from pathlib import Path
 
-from fastapi import APIRouter, Request, status
+from fastapi import APIRouter, status
 from pydantic import BaseModel
 
 from service.movie_downloaded import movie_downloaded
@@ -14,14 +14,20 @@ class RadarrMovie(BaseModel):
     path: Path
 
 
+class RadarrDeletedFile(BaseModel):
+    path: Path
+
+
 class RadarrWebhook(BaseModel):
     eventType: str
     movieFile: RadarrMovie | None = None
+    # Files an upgrade replaced
+    deletedFiles: list[RadarrDeletedFile] = []
 
 
 @router.post("", status_code=status.HTTP_200_OK)
-async def radarr_webhook(request: Request, payload: RadarrWebhook) -> dict[str, str]:
-    logger.info("Radarr webhook received: %s", await request.json())
+async def radarr_webhook(payload: RadarrWebhook) -> dict[str, str]:
+    logger.info("Radarr webhook received: %s", payload)
 
     if payload.eventType == "Test":
         logger.info("Received Radarr test webhook")
@@ -29,7 +35,9 @@ async def radarr_webhook(request: Request, payload: RadarrWebhook) -> dict[str,
     if payload.eventType == "Download":
         if payload.movieFile is None:
             raise ValueError("Missing movie in payload")
-        await movie_downloaded(payload.movieFile.path)
+        await movie_downloaded(
+            payload.movieFile.path, [file.path for file in payload.deletedFiles]
+        )
     else:
         logger.warning("Received Radarr webhook event type %s", payload.eventType)
         raise ValueError("Invalid event type")
@@ -1,7 +1,7 @@
 import logging
 from pathlib import Path
 
-from fastapi import APIRouter, Request, status
+from fastapi import APIRouter, status
 from pydantic import BaseModel
 
 from service.episode_downloaded import episode_downloaded
@@ -14,14 +14,27 @@ class SonarrEpisode(BaseModel):
     path: Path
 
 
+class SonarrSeries(BaseModel):
+    path: Path
+    # standard, daily or anime
+    type: str | None = None
+
+
+class SonarrDeletedFile(BaseModel):
+    path: Path
+
+
 class SonarrWebhook(BaseModel):
     eventType: str
+    series: SonarrSeries | None = None
     episodeFile: SonarrEpisode | None = None
+    # Files an upgrade replaced
+    deletedFiles: list[SonarrDeletedFile] = []
 
 
 @router.post("", status_code=status.HTTP_200_OK)
-async def sonarr_webhook(request: Request, payload: SonarrWebhook) -> dict[str, str]:
-    logger.info("Sonarr webhook received: %s", await request.json())
+async def sonarr_webhook(payload: SonarrWebhook) -> dict[str, str]:
+    logger.info("Sonarr webhook received: %s", payload)
 
     if payload.eventType == "Test":
         logger.info("Received Sonarr test webhook")
@@ -29,7 +42,13 @@ async def sonarr_webhook(request: Request, payload: SonarrWebhook) -> dict[str,
     if payload.eventType == "Download":
         if payload.episodeFile is None:
             raise ValueError("Missing episode in payload")
-        await episode_downloaded(payload.episodeFile.path)
+        series = payload.series
+        await episode_downloaded(
+            payload.episodeFile.path,
+            series.path if series is not None else None,
+            series.type if series is not None else None,
+            [file.path for file in payload.deletedFiles],
+        )
     else:
         logger.warning("Received Sonarr webhook event type %s", payload.eventType)
         raise ValueError("Invalid event type")
@@ -0,0 +1,113 @@
+import asyncio
+import time
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
+from pathlib import Path
+from types import TracebackType
+from typing import Any, NotRequired, Self, TypedDict
+
+import httpx
+
+
+class _MediaInfo(TypedDict):
+    videoCodec: NotRequired[str]
+    videoBitrate: NotRequired[int]
+    # e.g. "1920x1080"
+    resolution: NotRequired[str]
+
+
+class ArrFileData(TypedDict):
+    path: str
+    size: int
+    mediaInfo: NotRequired[_MediaInfo]
+
+
+@dataclass(frozen=True)
+class ArrFile:
+    """A movie or episode file as Radarr or Sonarr last analysed it."""
+
+    path: Path
+    size: int
+    video_codec: str | None
+    bit_rate: int | None
+    width: int | None
+
+    @classmethod
+    def from_response(cls, data: ArrFileData) -> "ArrFile":
+        media_info = data.get("mediaInfo", {})
+        width, _, _ = media_info.get("resolution", "").partition("x")
+        return cls(
+            path=Path(data["path"]),
+            size=data["size"],
+            video_codec=media_info.get("videoCodec"),
+            # Zero when the arr couldn't read it
+            bit_rate=media_info.get("videoBitrate") or None,
+            width=int(width) if width.isdigit() else None,
+        )
+
+
+class ArrClient:
+    """Shared plumbing for the Radarr and Sonarr v3 APIs.
+
+    One pooled, keep-alive connection set per client, at most `max_connections`
+    requests in flight, and GET responses cached for `cache_ttl` seconds. Use it
+    as an async context manager, or call aclose(), to release the connections.
+    Pass an httpx.MockTransport as `transport` to run without a server.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        api_key: str,
+        max_connections: int = 8,
+        cache_ttl: float = 300,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ) -> None:
+        self._client = httpx.AsyncClient(
+            base_url=base_url,
+            headers={"X-Api-Key": api_key},
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=60,
+            ),
+            timeout=httpx.Timeout(30, pool=None),
+            transport=transport,
+        )
+        self._requests = asyncio.Semaphore(max_connections)
+        self._cache_ttl = cache_ttl
+        self._cache: dict[tuple[str, str], tuple[float, Any]] = {}
+
+    async def _get(self, path: str, params: httpx.QueryParams | None = None) -> Any:
+        params = params or httpx.QueryParams()
+        key = (path, str(params))
+        if (cached := self._cache.get(key)) is not None and cached[
+            0
+        ] > time.monotonic():
+            return cached[1]
+        async with self._requests:
+            response = await self._client.get(path, params=params)
+        response.raise_for_status()
+        data = response.json()
+        self._cache[key] = (time.monotonic() + self._cache_ttl, data)
+        return data
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+    async def __aenter__(self) -> Self:
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        await self.aclose()
+
+
+async def arr_client[C: ArrClient](cls: type[C], **kwargs: Any) -> AsyncIterator[C]:
+    """A client that lives until its Resource provider is shut down."""
+    async with cls(**kwargs) as client:
+        yield client
@@ -3,9 +3,13 @@ from typer import Typer
 from .convert import convert
 from .convert_directory import convert_directory
 from .convert_all import convert_all
+from .convert_from_arr import convert_from_arr
+from .plan import plan
 
 app = Typer(name="Transcoder")
 
 app.command()(convert)
 app.command()(convert_directory)
 app.command()(convert_all)
+app.command()(convert_from_arr)
+app.command()(plan)
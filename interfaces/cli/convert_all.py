@@ -1,15 +1,25 @@
-from pathlib import Path
+from collections.abc import Iterable
+from domain.constants import MediaType, OrderingPolicy
+from interfaces.cli.convert_directory import validate_directory
+from interfaces.scanner import ScannedFile, scan_libraries
+from service.changed_files import changed_files
+from service.enqueue_transcode import enqueue_transcodes
+from service.order_files import order_files
+from transcoder.settings import settings
 
-from domain.constants import MediaType
-from interfaces.cli.convert_directory import convert_directory
 
-MEDIA_LIBRARIES = {
-    MediaType.TV: Path("/data/media/TV Shows/"),
-    MediaType.MOVIE: Path("/data/media/Movies/"),
-    MediaType.ANIMATION: Path("/data/media/Animated TV Shows/"),
-}
+def convert_all(
+    incremental: bool = False, order: OrderingPolicy = OrderingPolicy.SCAN
+) -> None:
+    libraries = settings.media_libraries
+    for media_dir in libraries:
+        validate_directory(media_dir)
 
-
-def convert_all() -> None:
-    for media_type, media_dir in MEDIA_LIBRARIES.items():
-        convert_directory(media_dir, media_type)
+    files: Iterable[tuple[MediaType, ScannedFile]] = (
+        (libraries[root], file)
+        for root, file in scan_libraries({root: root for root in libraries})
+    )
+    if incremental:
+        files = changed_files(files)
+    files = order_files(files, order)
+    enqueue_transcodes((file.path, media_type) for media_type, file in files)
@@ -1,26 +1,26 @@
 from pathlib import Path
 
-from domain.constants import MediaType
-from service.enqueue_transcode import enqueue_transcode
+from domain.constants import MediaType, OrderingPolicy
+from interfaces.scanner import scan_directory
+from service.enqueue_transcode import enqueue_transcodes
+from service.order_files import order_files
 
 
-FILE_EXTENSIONS = (
-    "mkv",
-    "m4v",
-    "avi",
-    "wmv",
-    "mov",
-    "mp4",
-)
-TYPES = ["**/*." + x for x in FILE_EXTENSIONS]
-
-
-def convert_directory(directory: Path, media_type: MediaType) -> None:
+def validate_directory(directory: Path) -> None:
     if not directory.exists():
         raise FileNotFoundError(f"Directory not found: {directory}")
     if not directory.is_dir():
         raise ValueError(f"Path is not a directory: {directory}")
 
-    for file_type in TYPES:
-        for file in directory.glob(file_type):
-            enqueue_transcode(file, media_type=media_type)
+
+def convert_directory(
+    directory: Path,
+    media_type: MediaType,
+    order: OrderingPolicy = OrderingPolicy.SCAN,
+) -> None:
+    validate_directory(directory)
+
+    files = order_files(
+        ((media_type, file) for file in scan_directory(directory)), order
+    )
+    enqueue_transcodes((file.path, media_type) for _, file in files)
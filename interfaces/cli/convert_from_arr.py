@@ -0,0 +1,18 @@
+import asyncio
+from pathlib import Path
+
+from domain.constants import MediaType
+from service.arr_library import arr_files_to_convert, close_arr_clients
+from service.enqueue_transcode import enqueue_transcodes
+
+
+async def _arr_files(movies: bool, series: bool) -> list[tuple[Path, MediaType]]:
+    try:
+        return await arr_files_to_convert(movies, series)
+    finally:
+        await close_arr_clients()
+
+
+def convert_from_arr(movies: bool = True, series: bool = True) -> None:
+    """Enqueue the library as Radarr and Sonarr list it, without a filesystem walk."""
+    enqueue_transcodes(asyncio.run(_arr_files(movies, series)))
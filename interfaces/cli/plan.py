@@ -0,0 +1,33 @@
+import typer
+
+from interfaces.cli.convert_directory import validate_directory
+from interfaces.scanner import scan_libraries
+from transcoder.settings import settings
+
+
+def plan() -> None:
+    """Report what transcoding the libraries would do, without enqueuing.
+
+    Files are judged from the probe cache; ones it doesn't hold are counted
+    but not probed.
+    """
+    # NumPy is only needed here, so other commands don't pay for importing it
+    from service.plan_library import plan_library
+
+    libraries = settings.media_libraries
+    for media_dir in libraries:
+        validate_directory(media_dir)
+    summaries, unprobed = plan_library(
+        (libraries[root], file)
+        for root, file in scan_libraries({root: root for root in libraries})
+    )
+    for media_type, summary in summaries.items():
+        hours = summary.encode_seconds / settings.plan_encode_speed / 3600
+        typer.echo(
+            f"{media_type}: {summary.files} files"
+            f" | skip {summary.skip} | remux {summary.remux} | encode {summary.encode}"
+            f" | ~{hours:.1f} encode hours"
+            f" | ~{summary.saved_bytes / 1024**3:.1f} GiB saved"
+        )
+    if unprobed:
+        typer.echo(f"{unprobed} files have no cached probe and are not counted")
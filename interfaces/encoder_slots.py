@@ -0,0 +1,52 @@
+import fcntl
+import os
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+from domain.constants import Stage
+from transcoder.settings import settings
+
+_POLL_INTERVAL = 1.0
+
+
+def _slot_limit(stage: Stage) -> int:
+    if stage == Stage.ENCODE:
+        return settings.encode_slots
+    if stage == Stage.REMUX:
+        return settings.copy_slots
+    return 0
+
+
+def _try_acquire(stage: Stage, limit: int) -> int | None:
+    directory = settings.lock_dir / "slots"
+    directory.mkdir(parents=True, exist_ok=True)
+    for slot in range(limit):
+        fd = os.open(directory / f"{stage}-{slot}.lock", os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            continue
+        return fd
+    return None
+
+
+@contextmanager
+def encoder_slot(stage: Stage) -> Iterator[None]:
+    """Hold one of the node's slots for this kind of ffmpeg job while it runs.
+
+    Slots are flock()ed files under lock_dir, so they are shared by every
+    worker process on the node and are released by the kernel if a
+    work horse is killed. A limit of 0 disables the limit.
+    """
+    limit = _slot_limit(stage)
+    if limit <= 0:
+        yield
+        return
+    while (fd := _try_acquire(stage, limit)) is None:
+        time.sleep(_POLL_INTERVAL)
+    try:
+        yield
+    finally:
+        os.close(fd)
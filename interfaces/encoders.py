@@ -0,0 +1,106 @@
+import functools
+import logging
+import subprocess
+from dataclasses import dataclass, field
+
+from domain.transcode import format_rate, parse_rate
+from interfaces import process
+from transcoder.settings import settings
+
+logger = logging.getLogger(__name__)
+
+_TEST_INPUT = ["-f", "lavfi", "-i", "color=size=256x256:duration=0.1"]
+
+
+@dataclass(frozen=True)
+class Encoder:
+    name: str
+    preset: str | None
+    # Scales the planned bit rate, which is tuned for NVENC
+    bitrate_factor: float = 1.0
+    extra_params: dict[str, str] = field(default_factory=dict)
+
+    def apply(self, params: dict[str, str]) -> dict[str, str]:
+        target_rate = int(parse_rate(params["b:v"]) * self.bitrate_factor)
+        resolved = params | self.extra_params
+        resolved["c:v"] = self.name
+        resolved["b:v"] = format_rate(target_rate)
+        if self.preset is not None:
+            resolved["preset"] = self.preset
+        return resolved
+
+
+ENCODERS = {
+    encoder.name: encoder
+    for encoder in [
+        Encoder("hevc_nvenc", preset="slow"),
+        Encoder("hevc_qsv", preset="slow"),
+        Encoder(
+            "hevc_vaapi",
+            preset=None,
+            extra_params={
+                "vaapi_device": "/dev/dri/renderD128",
+                "vf": "format=nv12,hwupload",
+            },
+        ),
+        # x265 matches the hardware encoders' quality at a lower bit rate
+        Encoder("libx265", preset="medium", bitrate_factor=0.8),
+    ]
+}
+
+
+def _available_encoders() -> set[str]:
+    try:
+        result = process.run(
+            [settings.ffmpeg_binary, "-hide_banner", "-encoders"],
+            timeout=settings.encoder_check_timeout,
+            capture_output=True,
+        )
+    except subprocess.TimeoutExpired as e:
+        raise RuntimeError(
+            f"Listing ffmpeg encoders timed out after {e.timeout}s"
+        ) from e
+    if result.returncode != 0:
+        raise RuntimeError(f"Unable to list ffmpeg encoders: {result.stderr.strip()}")
+    # Lines look like " V....D hevc_nvenc           NVIDIA NVENC hevc encoder"
+    return {
+        parts[1]
+        for line in result.stdout.splitlines()
+        if len(parts := line.split()) > 1 and parts[0].startswith("V")
+    }
+
+
+def _can_open_session(encoder: Encoder) -> bool:
+    params = encoder.apply({"b:v": "1000k"})
+    args = [settings.ffmpeg_binary, "-hide_banner", "-v", "error", *_TEST_INPUT]
+    for flag, value in params.items():
+        args += ["-" + flag, value]
+    args += ["-frames:v", "1", "-f", "null", "-"]
+    try:
+        result = process.run(
+            args, timeout=settings.encoder_check_timeout, capture_output=True
+        )
+    except subprocess.TimeoutExpired as e:
+        # A wedged driver can hang session setup; an encoder that does is no use
+        logger.info(f"Encoder {encoder.name} unusable: timed out after {e.timeout}s")
+        return False
+    if result.returncode != 0:
+        logger.info(f"Encoder {encoder.name} unusable: {result.stderr.strip()}")
+    return result.returncode == 0
+
+
+@functools.cache
+def select_encoder() -> Encoder:
+    """Pick the first configured encoder that ffmpeg has and can open a session on.
+
+    Probed once per process; worker.py warms it before forking work horses.
+    """
+    available = _available_encoders()
+    for name in settings.encoders:
+        if (encoder := ENCODERS.get(name)) is None:
+            logger.warning(f"Ignoring unknown encoder {name}")
+            continue
+        if name in available and _can_open_session(encoder):
+            logger.info(f"Selected encoder {name}")
+            return encoder
+    raise RuntimeError(f"None of the encoders {settings.encoders} are usable")
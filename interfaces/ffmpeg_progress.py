@@ -0,0 +1,163 @@
+import subprocess
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import asdict, dataclass
+from typing import IO, Any
+
+from opentelemetry import metrics
+
+from domain.constants import FailureReason
+from interfaces.process import terminate
+
+meter = metrics.get_meter(__name__)
+
+_fps = meter.create_gauge("ffmpeg.fps", unit="{frame}/s")
+_speed = meter.create_gauge("ffmpeg.speed", description="Multiple of realtime")
+_bitrate = meter.create_gauge("ffmpeg.bitrate", unit="kbit/s")
+_out_time = meter.create_gauge("ffmpeg.out_time", unit="s")
+
+_POLL_INTERVAL = 1.0
+
+
+class FFmpegError(Exception):
+    def __init__(self, reason: FailureReason, message: str) -> None:
+        super().__init__(message)
+        self.reason = reason
+
+
+@dataclass
+class Progress:
+    frame: int
+    fps: float
+    bitrate: float | None
+    out_time: float
+    speed: float | None
+    duration: float | None
+
+    @property
+    def eta(self) -> float | None:
+        if self.duration is None or not self.speed:
+            return None
+        return max(self.duration - self.out_time, 0.0) / self.speed
+
+    def as_dict(self) -> dict[str, Any]:
+        return asdict(self) | {"eta": self.eta}
+
+
+def _parse_float(value: str | None, suffix: str = "") -> float | None:
+    # ffmpeg reports N/A until it has a value
+    try:
+        return float(value.removesuffix(suffix)) if value is not None else None
+    except ValueError:
+        return None
+
+
+def _parse_progress(fields: dict[str, str], duration: float | None) -> Progress:
+    out_time_us = _parse_float(fields.get("out_time_us"))
+    return Progress(
+        frame=int(_parse_float(fields.get("frame")) or 0),
+        fps=_parse_float(fields.get("fps")) or 0.0,
+        bitrate=_parse_float(fields.get("bitrate"), "kbits/s"),
+        out_time=max(out_time_us or 0.0, 0.0) / 1_000_000,
+        speed=_parse_float(fields.get("speed"), "x"),
+        duration=duration,
+    )
+
+
+class _ProgressReader(threading.Thread):
+    """Parses ffmpeg's -progress key=value blocks as they arrive."""
+
+    def __init__(
+        self,
+        stream: IO[str],
+        duration: float | None,
+        attributes: dict[str, str],
+        on_progress: Callable[[Progress], None] | None,
+    ) -> None:
+        super().__init__(daemon=True)
+        self._stream = stream
+        self._duration = duration
+        self._attributes = attributes
+        self._on_progress = on_progress
+        self.out_time = 0.0
+        self.last_advance = time.monotonic()
+
+    def _publish(self, progress: Progress) -> None:
+        if progress.out_time > self.out_time:
+            self.out_time = progress.out_time
+            self.last_advance = time.monotonic()
+        _fps.set(progress.fps, self._attributes)
+        _out_time.set(progress.out_time, self._attributes)
+        if progress.speed is not None:
+            _speed.set(progress.speed, self._attributes)
+        if progress.bitrate is not None:
+            _bitrate.set(progress.bitrate, self._attributes)
+        if self._on_progress is not None:
+            self._on_progress(progress)
+
+    def run(self) -> None:
+        fields: dict[str, str] = {}
+        for line in self._stream:
+            key, _, value = line.strip().partition("=")
+            fields[key] = value
+            # Each block ends with progress=continue, or progress=end
+            if key == "progress":
+                self._publish(_parse_progress(fields, self._duration))
+                fields = {}
+
+
+def run_with_progress(
+    args: list[str],
+    stall_timeout: float,
+    timeout: float,
+    duration: float | None = None,
+    attributes: dict[str, str] | None = None,
+    on_progress: Callable[[Progress], None] | None = None,
+) -> int:
+    """Run an ffmpeg command that writes -progress to stdout, and return its exit code.
+
+    Stops ffmpeg and raises FFmpegError if it runs for longer than timeout
+    seconds, or if out_time stops advancing for stall_timeout seconds.
+    """
+    started = time.monotonic()
+    process = subprocess.Popen(args, stdout=subprocess.PIPE, text=True)
+    assert process.stdout is not None
+    reader = _ProgressReader(process.stdout, duration, attributes or {}, on_progress)
+    reader.start()
+    try:
+        while True:
+            try:
+                returncode = process.wait(timeout=_POLL_INTERVAL)
+            except subprocess.TimeoutExpired:
+                now = time.monotonic()
+                if now - started > timeout:
+                    error = FFmpegError(
+                        FailureReason.TIMEOUT,
+                        f"ffmpeg exceeded its {timeout:.0f}s time limit"
+                        f" (reached {reader.out_time:.1f}s)",
+                    )
+                elif now - reader.last_advance > stall_timeout:
+                    error = FFmpegError(
+                        FailureReason.STALLED,
+                        f"ffmpeg made no progress for {stall_timeout}s"
+                        f" (stuck at {reader.out_time:.1f}s)",
+                    )
+                else:
+                    continue
+                terminate(process)
+                reader.join()
+                raise error from None
+            else:
+                reader.join()
+                return returncode
+    except BaseException:
+        # RQ's job timeout or Ctrl-C landing mid-wait; don't leave ffmpeg holding
+        # its encoder session and writing to an output we are about to delete
+        if process.returncode is None:
+            process.kill()
+            process.wait()
+        reader.join()
+        raise
+    finally:
+        process.stdout.close()
@@ -1,59 +1,97 @@
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass
 from pathlib import Path
 import subprocess
 import json
 from typing import TypedDict, Any, NotRequired
 
-_COMMAND = [
-    "ffprobe",
-    "-select_streams",
-    "v:0",
-    "-show_entries",
-    "stream=codec_name,width,height,bit_rate",
-    "-of",
-    "json",
-]
+from domain.file_identity import FileIdentity
+from interfaces import process
+from interfaces.probe_cache import ProbeCache
+from transcoder.settings import settings
+
+# Bump whenever the probe commands or VideoInfo change shape, so cached entries are re-probed
+_CACHE_VERSION = 4
+
+
+class ProbeError(RuntimeError):
+    """FFprobe failed, or its output lacks what a VideoInfo needs."""
 
-_BIT_RATE_COMMAND = [
-    "ffprobe",
+
+_ARGS = [
+    "-hide_banner",
+    "-loglevel",
+    "fatal",
     "-show_entries",
-    "format=bit_rate:stream=codec_type,bit_rate",
+    (
+        "format=bit_rate,duration,start_time"
+        ":stream=index,codec_type,codec_name,width,height,bit_rate"
+        ":stream_disposition=attached_pic"
+        ":stream_tags=language"
+    ),
     "-of",
     "json",
 ]
 
 
-class _FFProbeStream(TypedDict):
-    codec_name: str
-    width: int
-    height: int
-    bit_rate: NotRequired[str]
+class _FFProbeDisposition(TypedDict):
+    attached_pic: int
 
 
-class _FFProbeResponse(TypedDict):
-    programs: list[Any]
-    streams: list[_FFProbeStream]
+class _FFProbeTags(TypedDict):
+    language: NotRequired[str]
 
 
-class _FFProbeFormat(TypedDict):
-    bit_rate: str
+class _FFProbeStream(TypedDict):
+    index: int
+    codec_type: str
+    codec_name: NotRequired[str]
+    width: NotRequired[int]
+    height: NotRequired[int]
+    bit_rate: NotRequired[str]
+    disposition: NotRequired[_FFProbeDisposition]
+    tags: NotRequired[_FFProbeTags]
 
 
-class _FFProbeBitRateStream(TypedDict):
-    codec_type: str
-    bit_rate: str
+class _FFProbeFormat(TypedDict):
+    bit_rate: NotRequired[str]
+    duration: NotRequired[str]
+    start_time: NotRequired[str]
 
 
-class _FFProbeBitRateResponse(TypedDict):
+class _FFProbeResponse(TypedDict):
     format: _FFProbeFormat
-    streams: list[_FFProbeBitRateStream]
+    streams: list[_FFProbeStream]
+
+
+def _bounded_args() -> list[str]:
+    # Limits how far ffprobe reads past the headers to find stream parameters
+    args = []
+    if settings.ffprobe_probesize is not None:
+        args += ["-probesize", str(settings.ffprobe_probesize)]
+    if settings.ffprobe_analyzeduration is not None:
+        args += ["-analyzeduration", str(settings.ffprobe_analyzeduration)]
+    return args
 
 
-def _calculate_bitrate(data: _FFProbeBitRateResponse) -> int:
-    total_bit_rate = int(data["format"]["bit_rate"])
+def _find_video_stream(data: _FFProbeResponse) -> _FFProbeStream:
+    for stream in data["streams"]:
+        if stream["codec_type"] != "video":
+            continue
+        if stream.get("disposition", {}).get("attached_pic"):
+            continue
+        return stream
+    raise ProbeError("FFprobe found no video stream")
+
+
+def _calculate_bitrate(data: _FFProbeResponse, video_stream: _FFProbeStream) -> int:
+    if (video_bit_rate := video_stream.get("bit_rate")) is not None:
+        return int(video_bit_rate)
+    if (format_bit_rate := data["format"].get("bit_rate")) is None:
+        raise ProbeError("FFprobe could not determine the bit rate")
+    total_bit_rate = int(format_bit_rate)
     for stream in data["streams"]:
         if (bit_rate := stream.get("bit_rate")) is not None and stream[
-            "bit_rate"
+            "codec_type"
         ] != "video":
             total_bit_rate -= int(bit_rate)
     return total_bit_rate
@@ -61,24 +99,71 @@ def _calculate_bitrate(data: _FFProbeBitRateResponse) -> int:
 
 def _execute_command(command: list[str]) -> Any:
     try:
-        result = subprocess.run(
-            command,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            check=True,
-            text=True,
+        result = process.run(
+            command, timeout=settings.ffprobe_time_limit, capture_output=True
         )
-    except subprocess.CalledProcessError as e:
-        raise RuntimeError(f"FFprobe failed: {e.stderr.strip()}") from e
+    except subprocess.TimeoutExpired as e:
+        raise ProbeError(f"FFprobe timed out after {e.timeout}s") from e
+    if result.returncode != 0:
+        raise ProbeError(f"FFprobe failed: {result.stderr.strip()}")
     return json.loads(result.stdout)
 
 
 def _execute_ffprobe(path: Path) -> _FFProbeResponse:
-    return _execute_command(_COMMAND + [str(path)])
+    response: _FFProbeResponse = _execute_command(
+        [settings.ffprobe_binary, *_ARGS, *_bounded_args(), str(path)]
+    )
+    return response
+
+
+# Seconds after a split point searched for the next keyframe
+_KEYFRAME_WINDOW = 30
+
+
+class _FFProbePacket(TypedDict):
+    pts_time: NotRequired[str]
+    flags: str
+
+
+class _FFProbePackets(TypedDict):
+    packets: NotRequired[list[_FFProbePacket]]
+
+
+def _keyframe_after(path: Path, time: float) -> float | None:
+    response: _FFProbePackets = _execute_command(
+        [
+            settings.ffprobe_binary,
+            "-hide_banner",
+            "-loglevel",
+            "fatal",
+            "-select_streams",
+            "v:0",
+            "-show_entries",
+            "packet=pts_time,flags",
+            # Seeks to the split point and reads only the window after it
+            "-read_intervals",
+            f"{time}%+{_KEYFRAME_WINDOW}",
+            "-of",
+            "json",
+            str(path),
+        ]
+    )
+    for packet in response.get("packets", []):
+        if "K" in packet["flags"] and "pts_time" in packet:
+            if (pts_time := float(packet["pts_time"])) >= time:
+                return pts_time
+    return None
+
+
+def find_keyframes(path: Path, times: list[float]) -> list[float]:
+    """The first video keyframe at or after each time, skipping any not found."""
+    keyframes = {_keyframe_after(path, time) for time in times}
+    return sorted(keyframe for keyframe in keyframes if keyframe is not None)
 
 
-def _execute_bit_rate_ffprobe(path: Path) -> _FFProbeBitRateResponse:
-    return _execute_command(_BIT_RATE_COMMAND + [str(path)])
+class SubtitleStream(TypedDict):
+    codec_name: str
+    language: str | None
 
 
 @dataclass
@@ -87,21 +172,68 @@ class VideoInfo:
     width: int
     height: int
     bit_rate: int
+    duration: float | None
+    # Timestamp of the first frame; seeks with -ss are relative to it
+    start_time: float
+    # In input order, so list positions match ffmpeg's 0:s:N specifiers
+    subtitles: list[SubtitleStream]
+
+
+def _subtitle_streams(data: _FFProbeResponse) -> list[SubtitleStream]:
+    return [
+        SubtitleStream(
+            codec_name=stream.get("codec_name", "unknown"),
+            language=stream.get("tags", {}).get("language"),
+        )
+        for stream in data["streams"]
+        if stream["codec_type"] == "subtitle"
+    ]
+
+
+def _probe_video_info(path: Path) -> VideoInfo:
+    ffprobe_data = _execute_ffprobe(path)
+    stream = _find_video_stream(ffprobe_data)
+    duration = ffprobe_data["format"].get("duration")
+    start_time = ffprobe_data["format"].get("start_time")
+    try:
+        return VideoInfo(
+            codec_name=stream["codec_name"],
+            width=stream["width"],
+            height=stream["height"],
+            bit_rate=_calculate_bitrate(ffprobe_data, stream),
+            duration=float(duration) if duration is not None else None,
+            start_time=float(start_time) if start_time is not None else 0.0,
+            subtitles=_subtitle_streams(ffprobe_data),
+        )
+    except KeyError as e:
+        raise ProbeError(f"FFprobe response missing {e}") from e
 
 
-def get_video_info(path: Path) -> VideoInfo:
+def get_cached_video_info(
+    identity: FileIdentity, cache: ProbeCache
+) -> VideoInfo | None:
+    """Look a file up in the probe cache without ever running ffprobe."""
+    if (cached := cache.get(identity, _CACHE_VERSION)) is None:
+        return None
+    return VideoInfo(**cached)
+
+
+def cached_video_fields(
+    cache: ProbeCache,
+) -> dict[FileIdentity, tuple[int, int, float | None]]:
+    """Width, bit rate and duration of every file in the probe cache."""
+    return cache.fields(_CACHE_VERSION, ("width", "bit_rate", "duration"))
+
+
+def get_video_info(path: Path, cache: ProbeCache | None = None) -> VideoInfo:
     if not path.exists() or not path.is_file():
         raise FileNotFoundError(f"File not found: {path}")
-    ffprobe_data = _execute_ffprobe(path)
-    stream = ffprobe_data["streams"][0]
-    if "bit_rate" in stream:
-        bit_rate = int(stream["bit_rate"])
-    else:
-        bit_rate_data = _execute_bit_rate_ffprobe(path)
-        bit_rate = _calculate_bitrate(bit_rate_data)
-    return VideoInfo(
-        codec_name=stream["codec_name"],
-        width=stream["width"],
-        height=stream["height"],
-        bit_rate=bit_rate,
-    )
+    if cache is None:
+        return _probe_video_info(path)
+
+    identity = FileIdentity.from_path(path)
+    if (cached := get_cached_video_info(identity, cache)) is not None:
+        return cached
+    video_info = _probe_video_info(path)
+    cache.put(identity, _CACHE_VERSION, asdict(video_info))
+    return video_info
@@ -0,0 +1,64 @@
+import os
+import shutil
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+from opentelemetry import trace
+
+from transcoder.settings import settings
+
+tracer = trace.get_tracer(__name__)
+
+FILE_IN_USE_DELAY = 5
+FILE_MODE = 0o775
+
+
+def _retry[**P](func: Callable[P, None], *args: P.args, **kwargs: P.kwargs) -> None:
+    # Media servers can briefly hold files open on SMB shares
+    for _ in range(4):
+        try:
+            return func(*args, **kwargs)
+        except PermissionError:
+            time.sleep(FILE_IN_USE_DELAY)
+    func(*args, **kwargs)
+
+
+def remove(path: Path) -> None:
+    _retry(path.unlink, missing_ok=True)
+
+
+def _set_ownership(path: Path) -> None:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fchown(fd, settings.puid, settings.pgid)
+        os.fchmod(fd, FILE_MODE)
+    finally:
+        os.close(fd)
+
+
+def finalize(source: Path, output: Path, final_path: Path) -> None:
+    """Put a finished output in place of its source.
+
+    An output on another filesystem (the scratch directory) is first copied
+    next to the source. The output is then renamed over the final path before
+    a source with a different name is removed, so at every point either the
+    source or the finished file exists.
+    """
+    staged = final_path.with_suffix(".tmp")
+    if output != staged and output.stat().st_dev != final_path.parent.stat().st_dev:
+        with tracer.start_as_current_span("finalize.copy"):
+            try:
+                shutil.copyfile(output, staged)
+            except BaseException:
+                remove(staged)
+                raise
+            remove(output)
+        output = staged
+    with tracer.start_as_current_span("finalize.set_ownership"):
+        _set_ownership(output)
+    with tracer.start_as_current_span("finalize.replace"):
+        _retry(os.replace, output, final_path)
+    if source != final_path:
+        with tracer.start_as_current_span("finalize.remove_source"):
+            remove(source)
@@ -0,0 +1,27 @@
+import hashlib
+import os
+from pathlib import Path
+
+# Bytes hashed at each of the start, middle and end of a file
+BLOCK_SIZE = 256 * 1024
+
+
+def fingerprint(path: Path) -> str:
+    """A partial content hash: the size, plus the first, middle and last blocks.
+
+    Three reads per file whatever its size, so it is cheap enough to run over a
+    whole library on network storage. Files no larger than three blocks are
+    hashed in full.
+    """
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        size = os.fstat(fd).st_size
+        digest = hashlib.blake2b(digest_size=16)
+        if size <= 3 * BLOCK_SIZE:
+            digest.update(os.pread(fd, size, 0))
+        else:
+            for offset in (0, (size - BLOCK_SIZE) // 2, size - BLOCK_SIZE):
+                digest.update(os.pread(fd, BLOCK_SIZE, offset))
+    finally:
+        os.close(fd)
+    return f"{size}:{digest.hexdigest()}"
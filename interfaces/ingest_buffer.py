@@ -0,0 +1,138 @@
+import asyncio
+import logging
+import time
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from opentelemetry import metrics
+
+from domain.constants import MediaType, Priority
+from interfaces.rq import AsyncRQClient
+
+logger = logging.getLogger(__name__)
+meter = metrics.get_meter(__name__)
+
+_dropped = meter.create_counter(
+    "ingest.dropped",
+    description="Imported files not enqueued, labelled by reason"
+    " (duplicate, replaced or missing)",
+)
+
+
+@dataclass
+class _Group:
+    first_seen: float
+    last_seen: float
+    videos: dict[Path, MediaType | None] = field(default_factory=dict)
+
+
+class IngestBuffer:
+    """Holds webhook imports briefly and enqueues them in batches.
+
+    Imports are grouped by folder (the movie's, or the series'). A group is
+    flushed once no import has arrived for it in `debounce` seconds, or once
+    it has waited `max_delay` seconds. Files an upgrade replaced before the
+    flush are dropped rather than transcoded.
+    """
+
+    def __init__(
+        self, rq_client: AsyncRQClient, debounce: float, max_delay: float
+    ) -> None:
+        self._rq_client = rq_client
+        self._debounce = debounce
+        self._max_delay = max_delay
+        self._groups: dict[Path, _Group] = {}
+        self._task: asyncio.Task[None] | None = None
+
+    def add(
+        self,
+        path: Path,
+        group: Path,
+        media_type: MediaType | None = None,
+        replaces: Iterable[Path] = (),
+    ) -> None:
+        now = time.monotonic()
+        for replaced in replaces:
+            for pending in self._groups.values():
+                if replaced in pending.videos:
+                    del pending.videos[replaced]
+                    _dropped.add(1, {"reason": "replaced"})
+        pending = self._groups.setdefault(group, _Group(now, now))
+        pending.last_seen = now
+        if path in pending.videos:
+            _dropped.add(1, {"reason": "duplicate"})
+        pending.videos[path] = media_type
+
+    def _deadline(self, group: _Group) -> float:
+        return min(group.last_seen + self._debounce, group.first_seen + self._max_delay)
+
+    async def _flush(self, groups: list[Path]) -> None:
+        flushing = {group: self._groups.pop(group) for group in groups}
+        videos = [
+            video for pending in flushing.values() for video in pending.videos.items()
+        ]
+        if not videos:
+            return
+        # Anything an upgrade deleted after the last import is gone by now
+        existing = await asyncio.to_thread(
+            lambda: [
+                (path, media_type) for path, media_type in videos if path.is_file()
+            ]
+        )
+        if len(existing) < len(videos):
+            _dropped.add(len(videos) - len(existing), {"reason": "missing"})
+        if not existing:
+            return
+        try:
+            enqueued = await self._rq_client.enqueue_transcodes(
+                existing, priority=Priority.HIGH
+            )
+        except Exception:
+            # Hold the files for another debounce window and try again
+            now = time.monotonic()
+            for group, pending in flushing.items():
+                merged = self._groups.setdefault(group, _Group(now, now))
+                merged.first_seen = merged.last_seen = now
+                merged.videos = pending.videos | merged.videos
+            raise
+        logger.info(f"Enqueued {enqueued} imported files")
+
+    async def _run(self) -> None:
+        while True:
+            now = time.monotonic()
+            due = [
+                group
+                for group, pending in self._groups.items()
+                if self._deadline(pending) <= now
+            ]
+            try:
+                await self._flush(due)
+            except Exception:
+                logger.exception("Unable to enqueue imported files")
+            # New groups can't be due before the debounce window has passed
+            wait = min(
+                (self._deadline(pending) for pending in self._groups.values()),
+                default=now + self._debounce,
+            )
+            await asyncio.sleep(max(wait - time.monotonic(), 0.1))
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def aclose(self) -> None:
+        """Stop the flush loop and enqueue everything still held.
+
+        A failed final flush is logged rather than raised, so the rest of
+        shutdown still runs; those files wait for the next convert_all.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        try:
+            await self._flush(list(self._groups))
+        except Exception:
+            logger.exception("Unable to enqueue imported files at shutdown")
@@ -0,0 +1,74 @@
+import json
+from pathlib import Path
+
+from domain.constants import TranscodeDecision
+from domain.file_identity import FileIdentity
+from interfaces.sqlite import SQLiteStore
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS library (
+    path TEXT PRIMARY KEY,
+    media_type TEXT NOT NULL,
+    device INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    decision TEXT NOT NULL,
+    params TEXT
+);
+"""
+
+_SELECT_ALL = "SELECT path, device, inode, size, mtime_ns FROM library"
+
+_UPSERT = """
+INSERT OR REPLACE INTO library
+    (path, media_type, device, inode, size, mtime_ns, decision, params)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+_DELETE = "DELETE FROM library WHERE path = ?"
+
+
+class LibraryIndex(SQLiteStore):
+    """Last transcode decision for every library path, and the file it was made on."""
+
+    SCHEMA = _SCHEMA
+
+    def identities(self) -> dict[Path, FileIdentity]:
+        return {
+            Path(path): FileIdentity(
+                device=device, inode=inode, size=size, mtime_ns=mtime_ns
+            )
+            for path, device, inode, size, mtime_ns in self._connect().execute(
+                _SELECT_ALL
+            )
+        }
+
+    def record(
+        self,
+        path: Path,
+        media_type: str,
+        identity: FileIdentity,
+        decision: TranscodeDecision,
+        params: dict[str, str] | None = None,
+    ) -> None:
+        connection = self._connect()
+        with connection:
+            connection.execute(
+                _UPSERT,
+                (
+                    str(path),
+                    media_type,
+                    identity.device,
+                    identity.inode,
+                    identity.size,
+                    identity.mtime_ns,
+                    decision,
+                    json.dumps(params) if params is not None else None,
+                ),
+            )
+
+    def forget(self, path: Path) -> None:
+        connection = self._connect()
+        with connection:
+            connection.execute(_DELETE, (str(path),))
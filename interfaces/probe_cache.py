@@ -0,0 +1,112 @@
+import json
+from pathlib import Path
+from typing import Any
+
+from opentelemetry import metrics
+
+from domain.file_identity import FileIdentity
+from interfaces.sqlite import SQLiteStore
+
+meter = metrics.get_meter(__name__)
+
+_lookups = meter.create_counter(
+    "probe_cache.lookups",
+    description="Probe cache lookups, labelled by result (hit or miss)",
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS probe (
+    device INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    version INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (device, inode)
+);
+"""
+
+_SELECT = """
+SELECT data FROM probe
+WHERE device = ? AND inode = ? AND size = ? AND mtime_ns = ? AND version = ?
+"""
+
+# Pulls a few fields out of every entry without decoding the rest in Python
+_SELECT_FIELDS = """
+SELECT device, inode, size, mtime_ns, {fields} FROM probe WHERE version = ?
+"""
+
+_UPSERT = """
+INSERT OR REPLACE INTO probe (device, inode, size, mtime_ns, version, data)
+VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+
+class ProbeCache(SQLiteStore):
+    """On-disk cache of probe results keyed by file identity.
+
+    Entries are stored per (device, inode); a changed size, mtime or probe
+    version makes the stored entry a miss and it is overwritten on the next put.
+    """
+
+    SCHEMA = _SCHEMA
+
+    def __init__(self, path: Path) -> None:
+        super().__init__(path)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, identity: FileIdentity, version: int) -> dict[str, Any] | None:
+        row = (
+            self._connect()
+            .execute(
+                _SELECT,
+                (
+                    identity.device,
+                    identity.inode,
+                    identity.size,
+                    identity.mtime_ns,
+                    version,
+                ),
+            )
+            .fetchone()
+        )
+        if row is None:
+            self.misses += 1
+            _lookups.add(1, {"result": "miss"})
+            return None
+        self.hits += 1
+        _lookups.add(1, {"result": "hit"})
+        data: dict[str, Any] = json.loads(row[0])
+        return data
+
+    def put(self, identity: FileIdentity, version: int, data: dict[str, Any]) -> None:
+        connection = self._connect()
+        with connection:
+            connection.execute(
+                _UPSERT,
+                (
+                    identity.device,
+                    identity.inode,
+                    identity.size,
+                    identity.mtime_ns,
+                    version,
+                    json.dumps(data),
+                ),
+            )
+
+    def fields(
+        self, version: int, names: tuple[str, ...]
+    ) -> dict[FileIdentity, tuple[Any, ...]]:
+        """The named top-level fields of every current entry, by file identity."""
+        query = _SELECT_FIELDS.format(
+            fields=", ".join(["json_extract(data, ?)"] * len(names))
+        )
+        return {
+            FileIdentity(
+                device=device, inode=inode, size=size, mtime_ns=mtime_ns
+            ): tuple(values)
+            for device, inode, size, mtime_ns, *values in self._connect().execute(
+                query, (*(f"$.{name}" for name in names), version)
+            )
+        }
@@ -0,0 +1,31 @@
+import subprocess
+from typing import Any
+
+from transcoder.settings import settings
+
+
+def terminate(process: subprocess.Popen[Any]) -> None:
+    """Ask a process to exit with SIGTERM, then SIGKILL it after the grace period."""
+    process.terminate()
+    try:
+        process.wait(timeout=settings.kill_grace_period)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def run(
+    args: list[str], timeout: float, capture_output: bool = False
+) -> subprocess.CompletedProcess[str]:
+    """subprocess.run, but terminating gracefully when the timeout expires.
+
+    Raises subprocess.TimeoutExpired once the process has been stopped.
+    """
+    pipe = subprocess.PIPE if capture_output else None
+    with subprocess.Popen(args, stdout=pipe, stderr=pipe, text=True) as process:
+        try:
+            stdout, stderr = process.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            terminate(process)
+            raise
+    return subprocess.CompletedProcess(args, process.returncode, stdout, stderr)
@@ -1,10 +1,19 @@
+import asyncio
+from collections.abc import Iterable
+from itertools import batched
 from pathlib import Path
 from typing import TypedDict, NotRequired
 
 import httpx
 
+from interfaces.arr import ArrClient, ArrFile, ArrFileData
+
+# Movie ids per list request, keeping the query string well under URL limits
+_IDS_PER_REQUEST = 100
+
 
 class _MovieFile(TypedDict):
+    movieId: int
     path: str
 
 
@@ -13,20 +22,18 @@ class _GetMovieResponse(TypedDict):
     hasFile: bool
 
 
+class _Movie(TypedDict):
+    id: int
+    movieFile: NotRequired[ArrFileData]
+
+
 class MovieNotDownloadedError(Exception):
     pass
 
 
-class RadarrClient:
-    def __init__(self, base_url: str, api_key: str) -> None:
-        self._client = httpx.AsyncClient(
-            base_url=base_url, headers={"X-Api-Key": api_key}
-        )
-
+class RadarrClient(ArrClient):
     async def get_movie_path(self, movie_id: int) -> Path:
-        response = await self._client.get(f"/api/v3/moviefile/{movie_id}")
-        response.raise_for_status()
-        data: _GetMovieResponse = response.json()
+        data: _GetMovieResponse = await self._get(f"/api/v3/moviefile/{movie_id}")
         if data["hasFile"]:
             movie_file = data.get("movieFile")
             if movie_file is None:
@@ -37,3 +44,36 @@ class RadarrClient:
         raise MovieNotDownloadedError(
             f"Movie with ID {movie_id} has not been downloaded."
         )
+
+    async def _get_movie_files(self, movie_ids: tuple[int, ...]) -> list[_MovieFile]:
+        files: list[_MovieFile] = await self._get(
+            "/api/v3/moviefile",
+            httpx.QueryParams([("movieId", movie_id) for movie_id in movie_ids]),
+        )
+        return files
+
+    async def get_movie_paths(self, movie_ids: Iterable[int]) -> dict[int, Path]:
+        """File paths for many movies, via Radarr's list endpoint.
+
+        Movies without a file are left out of the result.
+        """
+        responses = await asyncio.gather(
+            *(
+                self._get_movie_files(chunk)
+                for chunk in batched(sorted(set(movie_ids)), _IDS_PER_REQUEST)
+            )
+        )
+        return {
+            movie_file["movieId"]: Path(movie_file["path"])
+            for movie_files in responses
+            for movie_file in movie_files
+        }
+
+    async def get_movie_files(self) -> list[ArrFile]:
+        """Every downloaded movie file in the library, from a single request."""
+        movies: list[_Movie] = await self._get("/api/v3/movie")
+        return [
+            ArrFile.from_response(movie_file)
+            for movie in movies
+            if (movie_file := movie.get("movieFile")) is not None
+        ]
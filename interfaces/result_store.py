@@ -0,0 +1,65 @@
+import json
+from pathlib import Path
+
+from domain.file_identity import FileIdentity
+from interfaces.sqlite import SQLiteStore
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS result (
+    fingerprint TEXT PRIMARY KEY,
+    output TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    params TEXT NOT NULL
+);
+"""
+
+_SELECT = "SELECT output, size, mtime_ns, params FROM result WHERE fingerprint = ?"
+
+_UPSERT = """
+INSERT OR REPLACE INTO result (fingerprint, output, size, mtime_ns, params)
+VALUES (?, ?, ?, ?, ?)
+"""
+
+_DELETE = "DELETE FROM result WHERE fingerprint = ?"
+
+
+class ResultStore(SQLiteStore):
+    """The finished output for each source fingerprint, and the params it used.
+
+    An entry is only returned while its output still has the size and mtime it
+    was recorded with; one that has since changed or gone is dropped.
+    """
+
+    SCHEMA = _SCHEMA
+
+    def get(self, fingerprint: str) -> tuple[Path, dict[str, str]] | None:
+        connection = self._connect()
+        row = connection.execute(_SELECT, (fingerprint,)).fetchone()
+        if row is None:
+            return None
+        output, size, mtime_ns, params = row
+        try:
+            identity = FileIdentity.from_path(Path(output))
+        except FileNotFoundError:
+            identity = None
+        if identity is None or (identity.size, identity.mtime_ns) != (size, mtime_ns):
+            with connection:
+                connection.execute(_DELETE, (fingerprint,))
+            return None
+        return Path(output), json.loads(params)
+
+    def put(self, fingerprint: str, output: Path, params: dict[str, str]) -> None:
+        identity = FileIdentity.from_path(output)
+        connection = self._connect()
+        with connection:
+            connection.execute(
+                _UPSERT,
+                (
+                    fingerprint,
+                    str(output),
+                    identity.size,
+                    identity.mtime_ns,
+                    json.dumps(params),
+                ),
+            )
@@ -1,19 +1,335 @@
+import asyncio
+import hashlib
+import logging
+from collections.abc import Iterable, Sequence
+from itertools import batched
 from pathlib import Path
+from typing import Any
 
-from redis import Redis
-from rq import Queue
+from redis import Redis, RedisError
+from redis.asyncio import Redis as AsyncRedis
+from rq import Queue, get_current_job
+from rq.job import Callback, Dependency, Job, JobStatus
+from rq.utils import utcnow
 
-from domain.constants import MediaType
+from domain.constants import FailureReason, MediaType, Priority, Stage
+from interfaces.ffmpeg_progress import Progress
+
+logger = logging.getLogger(__name__)
+
+_PROBE_FUNCTION = "service.transcode.probe_file"
+_TRANSCODE_FUNCTION = "service.transcode.transcode_file"
+_SEGMENT_FUNCTION = "service.transcode.encode_segment"
+_CONCAT_FUNCTION = "service.transcode.concat_segments"
+_INFLIGHT_PREFIX = "transcode:inflight:"
+# Jobs enqueued before the stage queues existed wait here and call
+# transcode_file directly; encode workers drain it after their own queues
+LEGACY_QUEUE = "default"
+
+
+def queue_name(stage: Stage, priority: Priority) -> str:
+    if priority == Priority.HIGH:
+        return f"{stage}-{priority}"
+    return str(stage)
+
+
+def _inflight_key(path: Path) -> str:
+    digest = hashlib.sha1(str(path.resolve()).encode()).hexdigest()
+    return _INFLIGHT_PREFIX + digest
+
+
+def _release_inflight(job: Job, connection: Redis, *args: Any, **kwargs: Any) -> None:
+    connection.delete(_inflight_key(job.kwargs["path"]))
+
+
+# The probe stage only releases the path on failure; on success it hands the path
+# on to a remux/encode job, which releases it when that finishes either way
+_RELEASE_INFLIGHT = Callback(_release_inflight)
+
+
+def _probe_call(
+    path: Path, media_type: MediaType | None, priority: Priority
+) -> dict[str, Any]:
+    # The probe job's arguments, for both Queue.create_job and Queue.prepare_data
+    return {
+        "func": _PROBE_FUNCTION,
+        "kwargs": {"path": path, "media_type": media_type, "priority": priority},
+        "on_failure": _RELEASE_INFLIGHT,
+    }
+
+
+def _save_meta(key: str, value: Any) -> None:
+    if (job := get_current_job()) is None:
+        return
+    job.meta[key] = value
+    try:
+        job.save_meta()
+    except RedisError:
+        logger.warning("Unable to save %s for job %s", key, job.id, exc_info=True)
+
+
+def publish_progress(progress: Progress) -> None:
+    """Store ffmpeg progress in the current job's meta, where it can be queried."""
+    _save_meta("progress", progress.as_dict())
+
+
+def record_failure(reason: FailureReason) -> None:
+    _save_meta("failure_reason", str(reason))
+
+
+def record_encoder(encoder: str) -> None:
+    _save_meta("encoder", encoder)
+
+
+def job_time_left() -> float | None:
+    """Seconds until RQ's job timeout kills the current job, None without one."""
+    if (job := get_current_job()) is None or job.started_at is None:
+        return None
+    if job.timeout is None or job.timeout < 0:
+        return None
+    return job.timeout - (utcnow() - job.started_at).total_seconds()
+
+
+def dependency_encoders() -> list[str] | None:
+    """Encoders recorded by the jobs the current job waited on.
+
+    None unless every one of them finished successfully.
+    """
+    if (job := get_current_job()) is None:
+        return []
+    dependencies = job.fetch_dependencies()
+    # Dependencies that have since expired from Redis count as failed
+    if len(dependencies) != len(job.dependency_ids) or any(
+        dependency.get_status() != JobStatus.FINISHED for dependency in dependencies
+    ):
+        return None
+    return [dependency.meta.get("encoder", "unknown") for dependency in dependencies]
 
 
 class RQClient:
-    def __init__(self, redis_url: str, redis_port: int, timeout: int) -> None:
-        redis_connection = Redis(host=redis_url, port=redis_port)
-        self._queue = Queue(connection=redis_connection, default_timeout=timeout)
+    def __init__(
+        self,
+        connection: Redis,
+        timeout: int,
+        probe_timeout: int,
+        inflight_ttl: int,
+    ) -> None:
+        self._connection = connection
+        self._queues = {
+            (stage, priority): Queue(
+                queue_name(stage, priority),
+                connection=connection,
+                default_timeout=probe_timeout if stage == Stage.PROBE else timeout,
+            )
+            for stage in Stage
+            for priority in Priority
+        }
+        self._inflight_ttl = inflight_ttl
+
+    def _claim(self, path: Path) -> bool:
+        return bool(
+            self._connection.set(_inflight_key(path), 1, nx=True, ex=self._inflight_ttl)
+        )
+
+    def release(self, path: Path) -> None:
+        self._connection.delete(_inflight_key(path))
 
     def enqueue_transcode(
-        self, path: Path, media_type: MediaType | None = None
+        self,
+        path: Path,
+        media_type: MediaType | None = None,
+        priority: Priority = Priority.NORMAL,
+    ) -> bool:
+        """Enqueue a transcode unless one for the same file is queued or running.
+
+        The job starts on the probe stage, which routes it to remux or encode.
+        """
+        if not self._claim(path):
+            logger.info(f"Transcode already in flight for {path}")
+            return False
+        try:
+            queue, job = self.build_probe_job(path, media_type, priority)
+            queue.enqueue_job(job)
+        except BaseException:
+            self.release(path)
+            raise
+        return True
+
+    def build_probe_job(
+        self, path: Path, media_type: MediaType | None, priority: Priority
+    ) -> tuple[Queue, Job]:
+        """The probe job for a video, and the queue it goes on, without enqueuing it.
+
+        Building a job does no I/O; it only serializes the call. Shared by this
+        client and AsyncRQClient, so both enqueue identical jobs.
+        """
+        queue = self._queues[Stage.PROBE, priority]
+        job = queue.create_job(**_probe_call(path, media_type, priority))
+        job.enqueued_at = utcnow()
+        return queue, job
+
+    def enqueue_transcodes(
+        self,
+        videos: Iterable[tuple[Path, MediaType | None]],
+        batch_size: int = 500,
+        priority: Priority = Priority.NORMAL,
+    ) -> int:
+        """Enqueue videos in pipelined batches, one Redis round trip per batch.
+
+        Videos that already have a transcode queued or running are skipped.
+        """
+        enqueued = 0
+        for batch in batched(videos, batch_size):
+            pipeline = self._connection.pipeline(transaction=False)
+            for path, _ in batch:
+                pipeline.set(_inflight_key(path), 1, nx=True, ex=self._inflight_ttl)
+            claimed = [
+                video for video, is_new in zip(batch, pipeline.execute()) if is_new
+            ]
+            if len(claimed) < len(batch):
+                logger.info(
+                    f"Skipped {len(batch) - len(claimed)} transcodes already in flight"
+                )
+            if not claimed:
+                continue
+            try:
+                self._queues[Stage.PROBE, priority].enqueue_many(
+                    [
+                        Queue.prepare_data(**_probe_call(path, media_type, priority))
+                        for path, media_type in claimed
+                    ]
+                )
+            except BaseException:
+                self._connection.delete(*(_inflight_key(path) for path, _ in claimed))
+                raise
+            enqueued += len(claimed)
+        return enqueued
+
+    def peek_paths(self, stage: Stage, count: int) -> list[Path]:
+        """Sources of the next jobs a worker for this stage would take."""
+        job_ids: list[str] = []
+        for priority in Priority:
+            if len(job_ids) < count:
+                job_ids += self._queues[stage, priority].get_job_ids(
+                    length=count - len(job_ids)
+                )
+        jobs = Job.fetch_many(job_ids, connection=self._connection)
+        return [job.kwargs["path"] for job in jobs if job is not None]
+
+    def enqueue_stage(
+        self,
+        stage: Stage,
+        path: Path,
+        media_type: MediaType,
+        params: dict[str, str],
+        priority: Priority = Priority.NORMAL,
     ) -> None:
-        self._queue.enqueue(
-            "service.transcode.transcode_file", path=path, media_type=media_type
+        """Hand a probed, already claimed path on to its remux or encode queue."""
+        self._queues[stage, priority].enqueue(
+            _TRANSCODE_FUNCTION,
+            path=path,
+            media_type=media_type,
+            params=params,
+            on_success=_RELEASE_INFLIGHT,
+            on_failure=_RELEASE_INFLIGHT,
+        )
+
+    def enqueue_segments(
+        self,
+        path: Path,
+        media_type: MediaType,
+        params: dict[str, str],
+        segments: list[tuple[float, float | None]],
+        priority: Priority = Priority.NORMAL,
+    ) -> None:
+        """Hand a probed, already claimed path on as segment encodes and a join.
+
+        Any idle encode worker can take a segment. The join waits for every
+        segment job to end, failed or not, so it always runs to clean up and
+        release the path.
+        """
+        encode_queue = self._queues[Stage.ENCODE, priority]
+        jobs: list[Job | str] = [
+            encode_queue.enqueue(
+                _SEGMENT_FUNCTION,
+                path=path,
+                media_type=media_type,
+                params=params,
+                index=index,
+                start=start,
+                end=end,
+                # The join reads every segment's status, which may be hours after
+                # the first finished; keep them as long as the path is claimed
+                result_ttl=self._inflight_ttl,
+                failure_ttl=self._inflight_ttl,
+            )
+            for index, (start, end) in enumerate(segments)
+        ]
+        self._queues[Stage.REMUX, priority].enqueue(
+            _CONCAT_FUNCTION,
+            path=path,
+            media_type=media_type,
+            params=params,
+            count=len(segments),
+            depends_on=Dependency(jobs=jobs, allow_failure=True),
+            on_success=_RELEASE_INFLIGHT,
+            on_failure=_RELEASE_INFLIGHT,
+        )
+
+
+class AsyncRQClient:
+    """Enqueues transcodes like RQClient, without blocking the event loop.
+
+    Jobs are built by RQClient.build_probe_job and written with redis.asyncio;
+    only the Redis writes are done here rather than by RQ.
+    """
+
+    def __init__(
+        self, connection: AsyncRedis, rq_client: RQClient, inflight_ttl: int
+    ) -> None:
+        self._connection = connection
+        self._rq_client = rq_client
+        self._inflight_ttl = inflight_ttl
+
+    async def enqueue_transcodes(
+        self,
+        videos: Sequence[tuple[Path, MediaType | None]],
+        priority: Priority = Priority.NORMAL,
+    ) -> int:
+        """Enqueue videos in two round trips, skipping any already in flight."""
+        # resolve() can touch the filesystem, which may be a slow network mount
+        keys = await asyncio.to_thread(
+            lambda: [_inflight_key(path) for path, _ in videos]
         )
+        async with self._connection.pipeline(transaction=False) as pipeline:
+            for key in keys:
+                pipeline.set(key, 1, nx=True, ex=self._inflight_ttl)
+            results = await pipeline.execute()
+        claimed = [
+            (video, key)
+            for video, key, is_new in zip(videos, keys, results, strict=True)
+            if is_new
+        ]
+        if len(claimed) < len(videos):
+            logger.info(
+                f"Skipped {len(videos) - len(claimed)} transcodes already in flight"
+            )
+        if not claimed:
+            return 0
+        try:
+            async with self._connection.pipeline(transaction=True) as pipeline:
+                for (path, media_type), _ in claimed:
+                    queue, job = self._rq_client.build_probe_job(
+                        path, media_type, priority
+                    )
+                    # The writes Queue.enqueue_job makes for a job without
+                    # dependencies or a ttl, as of the rq==1.14.1 pinned in
+                    # pyproject.toml; recheck them whenever RQ is upgraded
+                    pipeline.hset(job.key, mapping=job.to_dict())
+                    pipeline.rpush(queue.key, job.id)
+                    pipeline.sadd(Queue.redis_queues_keys, queue.key)
+                await pipeline.execute()
+        except BaseException:
+            await self._connection.delete(*(key for _, key in claimed))
+            raise
+        return len(claimed)
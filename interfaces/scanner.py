@@ -0,0 +1,85 @@
+import logging
+import os
+from collections.abc import Iterator, Mapping
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+
+from domain.file_identity import FileIdentity
+from transcoder.settings import settings
+
+logger = logging.getLogger(__name__)
+
+FILE_EXTENSIONS = frozenset(
+    {
+        "mkv",
+        "m4v",
+        "avi",
+        "wmv",
+        "mov",
+        "mp4",
+    }
+)
+
+
+@dataclass(frozen=True)
+class ScannedFile:
+    path: Path
+    identity: FileIdentity
+
+
+def has_video_extension(name: str) -> bool:
+    return os.path.splitext(name)[1][1:].lower() in FILE_EXTENSIONS
+
+
+def _scan_directory(directory: Path) -> tuple[list[ScannedFile], list[Path]]:
+    # Stat happens here, on the pool, so per-file round trips to the NAS overlap
+    files: list[ScannedFile] = []
+    subdirectories: list[Path] = []
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirectories.append(Path(entry.path))
+                elif has_video_extension(entry.name) and entry.is_file():
+                    try:
+                        identity = FileIdentity.from_stat(entry.stat())
+                    except FileNotFoundError:
+                        continue
+                    files.append(ScannedFile(path=Path(entry.path), identity=identity))
+    except OSError:
+        logger.warning("Unable to scan directory %s", directory, exc_info=True)
+    return files, subdirectories
+
+
+def scan_libraries[T](
+    libraries: Mapping[T, Path], max_workers: int | None = None
+) -> Iterator[tuple[T, ScannedFile]]:
+    """Walk every library once, yielding video files as soon as they are found.
+
+    Each directory listing is a separate task on a shared thread pool, so
+    sibling directories (and separate libraries) are listed concurrently.
+    """
+    executor = ThreadPoolExecutor(max_workers=max_workers or settings.scan_workers)
+    pending: dict[Future[tuple[list[ScannedFile], list[Path]]], T] = {}
+    try:
+        for key, directory in libraries.items():
+            pending[executor.submit(_scan_directory, directory)] = key
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                key = pending.pop(future)
+                files, subdirectories = future.result()
+                for subdirectory in subdirectories:
+                    pending[executor.submit(_scan_directory, subdirectory)] = key
+                for file in files:
+                    yield key, file
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def scan_directory(
+    directory: Path, max_workers: int | None = None
+) -> Iterator[ScannedFile]:
+    for _, file in scan_libraries({directory: directory}, max_workers=max_workers):
+        yield file
@@ -0,0 +1,54 @@
+import asyncio
+from collections.abc import Iterable
+from pathlib import Path
+from typing import TypedDict
+
+import httpx
+
+from interfaces.arr import ArrClient, ArrFile, ArrFileData
+
+
+class _EpisodeFile(ArrFileData):
+    seriesId: int
+
+
+class Series(TypedDict):
+    id: int
+    path: str
+    # standard, daily or anime
+    seriesType: str
+
+
+class SonarrClient(ArrClient):
+    async def get_series(self) -> list[Series]:
+        series: list[Series] = await self._get("/api/v3/series")
+        return series
+
+    async def _get_episode_files(self, series_id: int) -> list[_EpisodeFile]:
+        files: list[_EpisodeFile] = await self._get(
+            "/api/v3/episodefile", httpx.QueryParams(seriesId=series_id)
+        )
+        return files
+
+    async def get_episode_files(
+        self, series_ids: Iterable[int]
+    ) -> dict[int, list[ArrFile]]:
+        """Every downloaded episode file, for many series at once."""
+        responses = await asyncio.gather(
+            *(self._get_episode_files(series_id) for series_id in set(series_ids))
+        )
+        files: dict[int, list[ArrFile]] = {}
+        for episode_files in responses:
+            for episode_file in episode_files:
+                files.setdefault(episode_file["seriesId"], []).append(
+                    ArrFile.from_response(episode_file)
+                )
+        return files
+
+    async def get_episode_paths(
+        self, series_ids: Iterable[int]
+    ) -> dict[int, list[Path]]:
+        return {
+            series_id: [file.path for file in files]
+            for series_id, files in (await self.get_episode_files(series_ids)).items()
+        }
@@ -0,0 +1,30 @@
+import os
+import sqlite3
+from pathlib import Path
+
+
+class SQLiteStore:
+    """Base for small on-disk stores shared by the CLI, API and worker processes.
+
+    The file usually sits on a network mount that every node shares, where
+    SQLite's WAL mode is unsupported, so it keeps the rollback journal.
+    """
+
+    SCHEMA = ""
+
+    def __init__(self, path: Path) -> None:
+        self._path = path
+        self._connection: sqlite3.Connection | None = None
+        self._pid: int | None = None
+
+    def _connect(self) -> sqlite3.Connection:
+        # RQ forks a work horse per job, and SQLite connections must not cross a fork
+        if self._connection is None or self._pid != os.getpid():
+            self._path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self._path, timeout=30)
+            # Explicitly, as WAL persists in files created before
+            connection.execute("PRAGMA journal_mode=DELETE")
+            connection.executescript(self.SCHEMA)
+            self._connection = connection
+            self._pid = os.getpid()
+        return self._connection
@@ -0,0 +1,171 @@
+"""Local read-ahead copies of sources that live on network storage.
+
+Run as ``python -m interfaces.staging <path>...`` to stage files in the
+background; workers start it detached so the copy outlives the job that
+started it.
+"""
+
+import fcntl
+import hashlib
+import logging
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from transcoder.settings import settings
+
+logger = logging.getLogger(__name__)
+
+_PARTIAL_SUFFIX = ".partial"
+
+
+def _abandoned(partial: Path) -> bool:
+    # A copy in progress holds a lock on its partial file until it is done
+    try:
+        fd = os.open(partial, os.O_RDONLY)
+    except FileNotFoundError:
+        return True
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return False
+    finally:
+        os.close(fd)
+    return True
+
+
+def _copy_into(source: Path, fd: int, size: int) -> None:
+    # One sequential read of the source, kernel to kernel, written from the
+    # start of fd without truncating the space reserved for it
+    with open(source, "rb") as src:
+        offset = 0
+        while offset < size:
+            sent = os.sendfile(fd, src.fileno(), offset, size - offset)
+            if sent == 0:
+                raise OSError(f"{source} shrank while it was being staged")
+            offset += sent
+
+
+class StagingCache:
+    """A directory of source copies, evicted least recently used past a byte budget.
+
+    A staged copy keeps its source's size and mtime, and is only used while
+    both still match the source. Access times record use for eviction.
+    """
+
+    def __init__(self, directory: Path, budget: int) -> None:
+        self._directory = directory
+        self._budget = budget
+
+    def _entry(self, source: Path) -> Path:
+        digest = hashlib.sha1(str(source.resolve()).encode()).hexdigest()
+        return self._directory / (digest + source.suffix)
+
+    def get(self, source: Path) -> Path | None:
+        """The staged copy of source, if there is a current one."""
+        entry = self._entry(source)
+        try:
+            staged, original = entry.stat(), source.stat()
+        except FileNotFoundError:
+            return None
+        if (staged.st_size, staged.st_mtime_ns) != (
+            original.st_size,
+            original.st_mtime_ns,
+        ):
+            return None
+        os.utime(entry, ns=(time.time_ns(), staged.st_mtime_ns))
+        return entry
+
+    def discard(self, source: Path) -> None:
+        self._entry(source).unlink(missing_ok=True)
+
+    def _evict(self, needed: int) -> None:
+        entries = []
+        # Copies in progress were sized up front to what they will hold
+        copying = 0
+        for entry in self._directory.iterdir():
+            if entry.name.startswith("."):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            if entry.suffix != _PARTIAL_SUFFIX:
+                entries.append((entry, stat))
+            elif not _abandoned(entry):
+                copying += stat.st_size
+        used = copying + sum(stat.st_size for _, stat in entries)
+        for entry, stat in sorted(entries, key=lambda item: item[1].st_atime_ns):
+            if used + needed <= self._budget:
+                break
+            # Readers that already have it open keep reading the unlinked file
+            entry.unlink(missing_ok=True)
+            used -= stat.st_size
+
+    def stage(self, source: Path) -> Path | None:
+        """Copy source into the cache, unless it is already there or being copied."""
+        if (staged := self.get(source)) is not None:
+            return staged
+        original = source.stat()
+        if original.st_size > self._budget:
+            return None
+        self._directory.mkdir(parents=True, exist_ok=True)
+        entry = self._entry(source)
+        partial = entry.with_suffix(entry.suffix + _PARTIAL_SUFFIX)
+        fd = os.open(partial, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return None
+            if (staged := self.get(source)) is not None:
+                # Another process finished staging it in the meantime
+                partial.unlink()
+                return staged
+            # Left over from a copy that was killed part way through
+            os.ftruncate(fd, 0)
+            with open(self._directory / ".evict", "w") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                self._evict(original.st_size)
+                # Reserve the whole size before the next copy counts what's used
+                os.ftruncate(fd, original.st_size)
+            _copy_into(source, fd, original.st_size)
+            os.utime(partial, ns=(time.time_ns(), original.st_mtime_ns))
+            os.replace(partial, entry)
+        except BaseException:
+            partial.unlink(missing_ok=True)
+            raise
+        finally:
+            os.close(fd)
+        logger.info(f"Staged {source} ({original.st_size} bytes)")
+        return entry
+
+
+def staging_cache() -> StagingCache | None:
+    if settings.staging_dir is None:
+        return None
+    return StagingCache(settings.staging_dir, settings.staging_budget)
+
+
+def prefetch(paths: list[Path]) -> None:
+    """Stage paths from a detached process, which outlives the calling job."""
+    if not paths:
+        return
+    subprocess.Popen(
+        [sys.executable, "-m", __name__, *map(str, paths)],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    if (cache := staging_cache()) is not None:
+        for path in sys.argv[1:]:
+            try:
+                cache.stage(Path(path))
+            except OSError:
+                logger.warning(f"Unable to stage {path}", exc_info=True)
@@ -1,34 +1,87 @@
 import datetime
-import json
+import glob
 import logging
 import os
+import re
+import shutil
+import sqlite3
 import subprocess
 import time
-
-from opentelemetry import trace
-
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import NoReturn
+
+from opentelemetry import metrics, trace
+
+from domain.constants import FailureReason, MediaType, Stage, TranscodeDecision
+from domain.file_identity import FileIdentity
+from domain.transcode import (
+    ENCODE_CODEC,
+    TARGET_EXTENSION,
+    concat_params,
+    format_rate,
+    is_text_subtitle,
+    segment_params,
+    segment_times,
+    should_segment,
+    stage_for,
+    target_bitrate,
+    time_limit,
+    transcode_stage,
+)
+from interfaces import process
+from interfaces.encoder_slots import encoder_slot
+from interfaces.encoders import select_encoder
+from interfaces.ffmpeg_progress import FFmpegError, Progress, run_with_progress
+from interfaces.finalize import finalize, remove
+from interfaces.ffprobe import (
+    ProbeError,
+    SubtitleStream,
+    VideoInfo,
+    find_keyframes,
+    get_video_info,
+)
+from interfaces.library_index import LibraryIndex
+from interfaces.probe_cache import ProbeCache
+from interfaces.staging import StagingCache
 from transcoder.settings import settings
 
 tracer = trace.get_tracer(__name__)
-
-FOLDER_TYPE_MAP = {
-    "Animated TV Shows": "animation",
-    "Movies": "movie",
-    "TV Shows": "tv",
-}
-FILE_IN_USE_DELAY = 5
-
-
-def get_video_type(path: str) -> str | None:
-    try:
-        folder = path.split("/")[3]
-        return FOLDER_TYPE_MAP.get(folder)
-    except IndexError:
-        return None
-
-
-def format_rate(rate: int) -> str:
-    return str(int(rate / 1000)) + "k"
+meter = metrics.get_meter(__name__)
+
+_subtitle_retries_avoided = meter.create_counter(
+    "transcode.subtitle_retries_avoided",
+    description="Files whose image-based subtitles were handled up front"
+    " instead of failing the encode and retrying without subtitles",
+)
+_failures = meter.create_counter(
+    "transcode.failures",
+    description="Failed ffmpeg runs, labelled by media type and failure reason",
+)
+_files = meter.create_counter(
+    "transcode.files",
+    description="Files handled, labelled by outcome (skipped, copied, encoded,"
+    " reused or failed), media type and encoder",
+)
+_stage_duration = meter.create_histogram(
+    "transcode.stage.duration",
+    unit="s",
+    description="Time spent in each stage of a transcode, labelled by stage"
+    " (probe, remux, encode, subtitles, finalize, retry or reuse) and media type",
+)
+_bytes_in = meter.create_gauge("transcode.bytes_in", unit="By")
+_bytes_out = meter.create_gauge("transcode.bytes_out", unit="By")
+_compression_ratio = meter.create_gauge(
+    "transcode.compression_ratio", description="Output size over source size"
+)
+
+# Our own limit fires this long before RQ's job timeout kills the work horse,
+# leaving time to stop ffmpeg and clean up
+_CLEANUP_MARGIN = 60
+
+# What follows the base name of an image subtitle _extract_subtitle wrote
+_SIDECAR_SUFFIX = re.compile(r"\.\d+\.[^.]+\.(sup|mks)")
 
 
 def extension_matches(a: str, b: str) -> bool:
@@ -36,145 +89,350 @@ def extension_matches(a: str, b: str) -> bool:
     return a == b or ("." + a) == b or a == ("." + b)
 
 
-def _delete_old_file(path: str, max_attempts: int = 5) -> None:
-    attempts = 0
-    while attempts < max_attempts:
-        attempts += 1
-        try:
-            os.remove(path)
-        except PermissionError:
-            result = subprocess.run("rm " + path)
-            if result.returncode == 0:
-                break
-            time.sleep(FILE_IN_USE_DELAY)
-        else:
-            break
-
-
-def _move_completed_file(old_path: str, new_path: str, max_attempts: int = 5) -> None:
-    attempts = 0
-    while attempts < max_attempts:
-        attempts += 1
+def _link_or_copy(source: Path, target: Path) -> None:
+    try:
+        os.link(source, target)
+    except OSError:
+        # Another filesystem, or one without hard links
         try:
-            os.rename(old_path, new_path)
-        except PermissionError:
-            time.sleep(FILE_IN_USE_DELAY)
-        else:
-            break
-    subprocess.run(["chown", f"{settings.puid}:{settings.pgid}", new_path], check=True)
-    subprocess.run(["chmod", "775", new_path], check=True)
+            shutil.copyfile(source, target)
+        except BaseException:
+            remove(target)
+            raise
 
 
 class Video:
-    BITRATES = {"tv": 2000000, "movie": 4000000, "animation": 1000000}
-
-    TARGET_EXTENSION = "mp4"
-    TARGET_WIDTH = 1920
+    TARGET_EXTENSION = TARGET_EXTENSION
 
     TEMP_EXTENSION = "tmp"
-    TIMEOUT = 20000
 
     LOGGER = logging.getLogger(__name__)
 
-    def __init__(self, path: str, media_type: str, indent: str = "") -> None:
+    def __init__(
+        self,
+        path: str,
+        media_type: str,
+        indent: str = "",
+        probe_cache: ProbeCache | None = None,
+        library_index: LibraryIndex | None = None,
+        on_progress: Callable[[Progress], None] | None = None,
+        staging: StagingCache | None = None,
+        time_left: Callable[[], float | None] | None = None,
+    ) -> None:
         self.path = path
         self.was_target_extension = self.path.endswith("." + Video.TARGET_EXTENSION)
         self.type = media_type
         self.indent = indent
+        self.probe_cache = probe_cache
+        self.library_index = library_index
+        self.on_progress = on_progress
+        self.staging = staging
+        self.time_left = time_left
+        self.failure_reason: FailureReason | None = None
+        self._file_info: VideoInfo | None = None
 
     def _log(self, message: str, level: int = logging.INFO) -> None:
         self.LOGGER.log(level, self.indent + message)
 
-    def _manual_bitrate(self, streams: list[dict[str, str]]) -> int:
-        bit_rate = 0
-        for stream in streams:
-            bit_rate -= int(stream.get("bit_rate", 0))
-        args = [
-            "ffprobe",
-            "-hide_banner",
-            "-loglevel",
-            "fatal",
-            "-show_format",
-            "-of",
-            "json",
-            self.path,
-        ]
-        raw = subprocess.check_output(args)
-        bit_rate += int(json.loads(raw)["format"]["bit_rate"])
-        return bit_rate
-
-    def _get_file_info(self) -> dict[str, str]:
-        # TODO: Parse json data using pydantic
-        args = [
-            "ffprobe",
-            "-hide_banner",
-            "-loglevel",
-            "fatal",
-            "-select_streams",
-            "v:0",
-            "-show_entries",
-            "stream=width,codec_name,bit_rate",
-            "-of",
-            "json",
-            self.path,
-        ]
+    def _record_decision(
+        self,
+        path: str,
+        decision: TranscodeDecision,
+        params: dict[str, str] | None = None,
+    ) -> None:
+        if self.library_index is None:
+            return
+        try:
+            identity = FileIdentity.from_path(Path(path))
+            self.library_index.record(Path(path), self.type, identity, decision, params)
+            if path != self.path:
+                self.library_index.forget(Path(self.path))
+        except (OSError, sqlite3.Error):
+            self.LOGGER.warning(
+                "Unable to record transcode decision for %s", path, exc_info=True
+            )
+
+    @contextmanager
+    def _stage(self, stage: str) -> Iterator[trace.Span]:
+        """A child span for one stage of the transcode, also timed as a metric."""
+        start = time.perf_counter()
+        with tracer.start_as_current_span(f"transcode.{stage}") as span:
+            try:
+                yield span
+            finally:
+                _stage_duration.record(
+                    time.perf_counter() - start,
+                    {"stage": stage, "media_type": self.type},
+                )
+
+    def _count(self, outcome: str, encoder: str | None = None) -> None:
+        attributes = {"outcome": outcome, "media_type": self.type}
+        if encoder is not None:
+            attributes["encoder"] = encoder
+        _files.add(1, attributes)
+
+    def _get_file_info(self) -> VideoInfo | None:
+        if self._file_info is not None:
+            return self._file_info
         try:
-            raw_data = subprocess.check_output(args)
-        except subprocess.CalledProcessError:
-            return {}
-        streams = json.loads(raw_data)["streams"]
-        data = streams[0]
-        if "bit_rate" not in data:
-            data["bit_rate"] = str(self._manual_bitrate(streams))
+            with self._stage("probe"):
+                info = get_video_info(Path(self.path), cache=self.probe_cache)
+        except (FileNotFoundError, ProbeError):
+            return None
         self._log(
-            f"Codec: {data.get('codec_name', 'unknown')}"
-            + f" | Width: {data.get('width', 'unknown')}"
-            + f" | Bitrate: {data.get('bit_rate', 'unknown')}",
+            f"Codec: {info.codec_name}"
+            + f" | Width: {info.width}"
+            + f" | Bitrate: {info.bit_rate}",
             level=logging.DEBUG,
         )
-        return data  # type: ignore[no-any-return]
+        self._file_info = info
+        return info
+
+    def _require_file_info(self) -> VideoInfo:
+        if (file_info := self._get_file_info()) is None:
+            raise ProbeError(f"Unable to determine file info for {self.path}")
+        return file_info
 
-    def _get_params(self) -> dict[str, str] | None:
+    def _duration(self) -> float | None:
         file_info = self._get_file_info()
-        try:
-            width = int(file_info["width"])
-            rate = int(file_info["bit_rate"])
-        except KeyError:
-            raise Exception("Unable to determine file info")  # TODO: Better exception
+        return file_info.duration if file_info else None
+
+    def _time_limit(self, duration: float | None = None) -> float:
+        # Defaults to the whole file's duration. Read when ffmpeg starts, so time
+        # the job already spent, e.g. waiting for an encoder slot, is taken off
+        maximum: float = settings.transcode_timeout
+        if self.time_left is not None and (left := self.time_left()) is not None:
+            maximum = min(maximum, left)
+        return time_limit(
+            duration if duration is not None else self._duration(),
+            factor=settings.transcode_time_factor,
+            minimum=settings.transcode_min_time,
+            maximum=max(maximum - _CLEANUP_MARGIN, 0),
+        )
+
+    def _subtitle_map_args(self, input_index: int = 0) -> list[str]:
+        file_info = self._require_file_info()
+        args = []
+        for index, subtitle in enumerate(file_info.subtitles):
+            if is_text_subtitle(subtitle["codec_name"]):
+                args += ["-map", f"{input_index}:s:{index}"]
+        return args
 
-        rate_modifier = width / Video.TARGET_WIDTH
-        target_rate = int(rate_modifier * Video.BITRATES[self.type])
+    def _image_subtitles(self) -> list[tuple[int, SubtitleStream]]:
+        file_info = self._get_file_info()
+        if file_info is None:
+            return []
+        return [
+            (index, subtitle)
+            for index, subtitle in enumerate(file_info.subtitles)
+            if not is_text_subtitle(subtitle["codec_name"])
+        ]
+
+    def _extract_subtitle(
+        self, index: int, subtitle: SubtitleStream, source: str, base_path: str
+    ) -> None:
+        if subtitle["codec_name"] == "hdmv_pgs_subtitle":
+            container, extension = "sup", "sup"
+        else:
+            container, extension = "matroska", "mks"
+        language = subtitle["language"] or "und"
+        output_path = f"{base_path}.{index}.{language}.{extension}"
+        args = [
+            settings.ffmpeg_binary,
+            "-hide_banner",
+            "-y",
+            "-v",
+            "error",
+            "-i",
+            source,
+            "-map",
+            f"0:s:{index}",
+            "-c",
+            "copy",
+            "-f",
+            container,
+            output_path,
+        ]
+        try:
+            returncode = process.run(args, timeout=self._time_limit()).returncode
+        except subprocess.TimeoutExpired:
+            returncode = None
+        if returncode == 0:
+            self._log(f"Extracted subtitle stream {index} to {output_path}")
+        else:
+            self._log(f"Unable to extract subtitle stream {index}", logging.WARNING)
+            remove(Path(output_path))
+
+    def get_params(self) -> dict[str, str] | None:
+        file_info = self._require_file_info()
+        media_type = MediaType(self.type)
+        _, extension = os.path.splitext(self.path)
+        stage = transcode_stage(
+            extension, media_type, file_info.width, file_info.bit_rate
+        )
+        if stage is None:
+            return None
         params = {
             "c:a": "ac3",
-            "c:s": "mov_text",  # TODO: Add support for other subtitle types
             "movflags": "+faststart",  # Moves moov atom to start of file
         }
+        # Only text subtitles can become mov_text; image ones are dropped or extracted
+        if any(is_text_subtitle(s["codec_name"]) for s in file_info.subtitles):
+            params["c:s"] = "mov_text"
 
-        if rate >= (target_rate * 1.05):
-            params["c:v"] = "hevc_nvenc"
-            params["preset"] = "slow"
-            params["b:v"] = format_rate(target_rate)
+        if stage == Stage.ENCODE:
+            params["c:v"] = ENCODE_CODEC
+            params["b:v"] = format_rate(target_bitrate(media_type, file_info.width))
         else:
-            if self.was_target_extension:
-                return None
-            else:
-                params["c:v"] = "copy"
+            params["c:v"] = "copy"
         return params
 
-    def transcode(self, drop_subs: bool = False) -> bool:
-        # TODO: timeout? could do on subprocess.run
+    def plan(self) -> dict[str, str] | None:
+        params = self.get_params()
+        if params is None:
+            self._log("No Transcode Required")
+            self._count("skipped")
+            self._record_decision(self.path, TranscodeDecision.SKIPPED)
+        return params
+
+    @property
+    def final_path(self) -> str:
+        base_path, _ = os.path.splitext(self.path)
+        return f"{base_path}.{Video.TARGET_EXTENSION}"
+
+    def reuse(self, output: Path, params: dict[str, str]) -> None:
+        """Put an identical source's finished output in place of this one."""
+        final_path = Path(self.final_path)
+        with self._stage("reuse") as span:
+            span.set_attribute("transcode.path", self.path)
+            span.set_attribute("transcode.media_type", self.type)
+            span.set_attribute("transcode.output", str(output))
+            if output == final_path:
+                # The same release re-imported over an earlier output
+                if Path(self.path) != final_path:
+                    remove(Path(self.path))
+            else:
+                self._reuse_sidecars(output)
+                staged = final_path.with_suffix("." + self.TEMP_EXTENSION)
+                remove(staged)
+                _link_or_copy(output, staged)
+                finalize(Path(self.path), staged, final_path)
+        self._log(f"Reused existing output {output}")
+        self._count("reused", params["c:v"])
+        self._record_decision(str(final_path), TranscodeDecision.TRANSCODED, params)
+
+    def _reuse_sidecars(self, output: Path) -> None:
+        # The subtitles extracted alongside the reused output, renamed to match
+        base_path, _ = os.path.splitext(self.path)
+        for sidecar in output.parent.glob(glob.escape(output.stem) + ".*"):
+            suffix = sidecar.name.removeprefix(output.stem)
+            if _SIDECAR_SUFFIX.fullmatch(suffix):
+                target = Path(base_path + suffix)
+                remove(target)
+                _link_or_copy(sidecar, target)
+
+    def _source(self) -> str:
+        # Read from a local read-ahead copy rather than the NAS when one is ready
+        if self.staging is not None:
+            if (staged := self.staging.get(Path(self.path))) is not None:
+                self._log(f"Reading from staged copy {staged}")
+                return str(staged)
+        return self.path
+
+    def _output_path(self, base_path: str) -> str:
+        if settings.scratch_dir is None:
+            return f"{base_path}.tmp"
+        # Encoders seek around their output; keep that off network storage
+        settings.scratch_dir.mkdir(parents=True, exist_ok=True)
+        name = f"{os.getpid()}-{os.path.basename(base_path)}.tmp"
+        return str(settings.scratch_dir / name)
+
+    def _ffmpeg_args(self) -> list[str]:
+        return [
+            settings.ffmpeg_binary,
+            "-hide_banner",
+            "-y",
+            "-v",
+            "error",
+            "-nostats",
+            "-progress",
+            "pipe:1",
+            "-stats_period",
+            str(settings.progress_interval),
+        ]
+
+    def _run_ffmpeg(
+        self, args: list[str], stage: Stage, duration: float | None, encoder: str
+    ) -> None:
+        # Waiting for a slot is not part of the stage's time
+        with encoder_slot(stage), self._stage(str(stage)) as span:
+            span.set_attribute("transcode.encoder", encoder)
+            returncode = run_with_progress(
+                args,
+                stall_timeout=settings.transcode_stall_timeout,
+                timeout=self._time_limit(duration),
+                duration=duration,
+                attributes={"media_type": self.type, "encoder": encoder},
+                on_progress=self.on_progress,
+            )
+        if returncode != 0:
+            raise FFmpegError(
+                FailureReason.EXIT_CODE,
+                f"ffmpeg exited with {returncode}: " + subprocess.list2cmdline(args),
+            )
+
+    def _record_failure(self, span: trace.Span, exc: BaseException) -> None:
+        self.failure_reason = (
+            exc.reason if isinstance(exc, FFmpegError) else FailureReason.ERROR
+        )
+        _failures.add(1, {"media_type": self.type, "reason": self.failure_reason})
+        span.set_attribute("transcode.success", False)
+        span.set_attribute("transcode.failure_reason", self.failure_reason)
+        span.record_exception(exc)
+        span.set_status(trace.StatusCode.ERROR, str(exc))
+
+    def _finish(
+        self, source: str, output_path: str, final_path: str, encoder: str
+    ) -> None:
+        base_path, _ = os.path.splitext(self.path)
+        if settings.image_subtitles == "extract":
+            if image_subtitles := self._image_subtitles():
+                with self._stage("subtitles"):
+                    for index, subtitle in image_subtitles:
+                        self._extract_subtitle(index, subtitle, source, base_path)
+        bytes_in = os.stat(self.path).st_size
+        bytes_out = os.stat(output_path).st_size
+        with self._stage("finalize"):
+            finalize(Path(self.path), Path(output_path), Path(final_path))
+            if self.staging is not None:
+                self.staging.discard(Path(self.path))
+        attributes = {"media_type": self.type, "encoder": encoder}
+        _bytes_in.set(bytes_in, attributes)
+        _bytes_out.set(bytes_out, attributes)
+        if bytes_in:
+            _compression_ratio.set(bytes_out / bytes_in, attributes)
+        span = trace.get_current_span()
+        span.set_attribute("transcode.bytes_in", bytes_in)
+        span.set_attribute("transcode.bytes_out", bytes_out)
+
+    def transcode(
+        self, drop_subs: bool = False, params: dict[str, str] | None = None
+    ) -> bool:
         start = time.time()
+        self.failure_reason = None
 
         with tracer.start_as_current_span("transcode") as span:
             span.set_attribute("transcode.path", self.path)
             span.set_attribute("transcode.media_type", self.type)
             span.set_attribute("transcode.drop_subs", drop_subs)
 
-            params = self._get_params()
             if params is None:
-                self._log("No Transcode Required")
+                params = self.plan()
+            if params is None:
                 span.set_attribute("transcode.skipped", True)
                 return False
+            if params["c:v"] == ENCODE_CODEC:
+                params = select_encoder().apply(params)
 
             span.set_attribute("transcode.skipped", False)
             if "c:v" in params:
@@ -183,22 +441,29 @@ class Video:
                 span.set_attribute("transcode.target_bitrate", params["b:v"])
 
             if drop_subs:
-                params.pop("c:s")
+                params = {
+                    flag: value for flag, value in params.items() if flag != "c:s"
+                }
             self._log(f"Params: {params}", level=logging.DEBUG)
 
+            image_subtitles = self._image_subtitles()
+            if image_subtitles and not drop_subs:
+                extract = settings.image_subtitles == "extract"
+                self._log(
+                    f"{'Extracting' if extract else 'Dropping'}"
+                    f" {len(image_subtitles)} image-based subtitle streams"
+                )
+                _subtitle_retries_avoided.add(1, {"media_type": self.type})
+
             base_path, extension = os.path.splitext(self.path)
-            output_path = f"{base_path}.tmp"
+            source = self._source()
+            output_path = self._output_path(base_path)
+            final_path = self.final_path
             success = True
             try:
-                args = [
-                    "ffmpeg",
-                    "-hide_banner",
-                    "-y",
-                    "-v",
-                    "error",
-                    "-stats",
+                args = self._ffmpeg_args() + [
                     "-i",
-                    self.path,
+                    source,
                     "-map",
                     "0:a?",
                     "-map",
@@ -206,51 +471,215 @@ class Video:
                     "-f",
                     self.TARGET_EXTENSION,
                 ]
-                if not drop_subs:
-                    args += ["-map", "0:s?"]
+                if "c:s" in params:
+                    args += self._subtitle_map_args()
                 for flag, value in params.items():
                     args += ["-" + flag, value]
                 args += [output_path]
 
-                result = subprocess.run(args)
-                if result.returncode == 0:
-                    self._log("Successfully Transcoded")
-                    span.set_attribute("transcode.success", True)
-                    _delete_old_file(self.path)
-                    _move_completed_file(
-                        output_path, f"{base_path}.{Video.TARGET_EXTENSION}"
-                    )
-                else:
-                    # TODO: Better exception
-                    raise Exception(
-                        "Transcode Failed with command: ",
-                        subprocess.list2cmdline(result.args),
-                    )
+                self._run_ffmpeg(
+                    args, stage_for(params), self._duration(), params["c:v"]
+                )
+                self._log("Successfully Transcoded")
+                span.set_attribute("transcode.success", True)
+                self._finish(source, output_path, final_path, params["c:v"])
             except BaseException as exc:
                 success = False
-                span.set_attribute("transcode.success", False)
-                span.record_exception(exc)
-                span.set_status(trace.StatusCode.ERROR, str(exc))
+                self._record_failure(span, exc)
                 self.LOGGER.exception("Transcode Failed")
                 if os.path.exists(output_path):
                     self._log("Deleting partial output file")
-                    _delete_old_file(output_path)
-                if not drop_subs:
+                    remove(Path(output_path))
+                # A timed out or stalled run would only time out again
+                if "c:s" in params and self.failure_reason == FailureReason.EXIT_CODE:
                     self._log("Retrying without subtitles")
-                    return self.transcode(drop_subs=True)
+                    with self._stage("retry"):
+                        return self.transcode(drop_subs=True, params=params)
             finally:
                 duration = time.time() - start
                 runtime = datetime.timedelta(seconds=int(round(duration)))
                 self._log(f"Time taken: {runtime}", level=logging.DEBUG)
+            if success:
+                self._count(
+                    "copied" if params["c:v"] == "copy" else "encoded", params["c:v"]
+                )
+                self._record_decision(final_path, TranscodeDecision.TRANSCODED, params)
+            else:
+                self._count("failed", params["c:v"])
             return success
 
+    def segments(self, params: dict[str, str]) -> list[tuple[float, float | None]]:
+        """Start and end times to encode in parallel, or nothing to encode whole.
+
+        Split points are moved to the next keyframe so that each segment
+        decodes on its own. The last segment runs to the end of the file.
+        """
+        file_info = self._get_file_info()
+        duration = file_info.duration if file_info else None
+        if (
+            file_info is None
+            or duration is None
+            or stage_for(params) != Stage.ENCODE
+            or not should_segment(
+                MediaType(self.type),
+                duration,
+                settings.segment_min_duration,
+                settings.segment_count,
+            )
+        ):
+            return []
+        # Keyframe timestamps are absolute, but -ss counts from the start time
+        offset = file_info.start_time
+        times = [
+            time + offset for time in segment_times(duration, settings.segment_count)
+        ]
+        try:
+            keyframes = [
+                keyframe - offset for keyframe in find_keyframes(Path(self.path), times)
+            ]
+        except (OSError, ProbeError, ValueError):
+            self.LOGGER.warning(
+                "Unable to find keyframes in %s, encoding it whole",
+                self.path,
+                exc_info=True,
+            )
+            return []
+        if not keyframes:
+            return []
+        return list(zip([0.0, *keyframes], [*keyframes, None]))
+
+    # Segments are encoded on other nodes, so they live next to the source
+    # rather than in any one node's scratch directory
+    def _segment_path(self, index: int) -> str:
+        base_path, _ = os.path.splitext(self.path)
+        return f"{base_path}.segment{index}.{self.TEMP_EXTENSION}"
+
+    def _segment_list_path(self) -> str:
+        base_path, _ = os.path.splitext(self.path)
+        return f"{base_path}.segments.{self.TEMP_EXTENSION}"
+
+    def discard_segments(self, count: int) -> None:
+        for index in range(count):
+            remove(Path(self._segment_path(index)))
+        remove(Path(self._segment_list_path()))
+
+    def abandon_segments(self, count: int) -> NoReturn:
+        """Give up on a segmented transcode, one of whose segments failed."""
+        self.discard_segments(count)
+        self._count("failed")
+        raise RuntimeError(f"Not every segment of {self.path} was encoded")
+
+    def encode_segment(
+        self, index: int, start: float, end: float | None, params: dict[str, str]
+    ) -> str:
+        """Encode the video stream between start and end, returning the encoder.
+
+        Raises if the encode fails.
+        """
+        params = select_encoder().apply(segment_params(params))
+        output_path = self._segment_path(index)
+        duration = self._duration()
+        if end is not None:
+            duration = end - start
+        elif duration is not None:
+            duration -= start
+        with tracer.start_as_current_span("transcode.segment") as span:
+            span.set_attribute("transcode.path", self.path)
+            span.set_attribute("transcode.media_type", self.type)
+            span.set_attribute("transcode.segment", index)
+            span.set_attribute("transcode.video_codec", params["c:v"])
+            args = self._ffmpeg_args() + ["-ss", str(start)]
+            if end is not None:
+                args += ["-t", str(end - start)]
+            args += ["-i", self._source(), "-map", "0:V"]
+            for flag, value in params.items():
+                args += ["-" + flag, value]
+            # Matroska, so the library scanners never pick a segment up
+            args += ["-f", "matroska", output_path]
+            try:
+                self._run_ffmpeg(args, Stage.ENCODE, duration, params["c:v"])
+            except BaseException as exc:
+                self._record_failure(span, exc)
+                remove(Path(output_path))
+                raise
+            span.set_attribute("transcode.success", True)
+            self._log(f"Encoded segment {index}")
+        return params["c:v"]
+
+    def concat_segments(self, count: int, params: dict[str, str], encoder: str) -> None:
+        """Join encoded segments with the source's other streams into the output.
+
+        encoder is what the segments were encoded with, for metrics.
+        """
+        base_path, _ = os.path.splitext(self.path)
+        source = self._source()
+        list_path = self._segment_list_path()
+        output_path = self._output_path(base_path)
+        final_path = self.final_path
+        with tracer.start_as_current_span("transcode.concat") as span:
+            span.set_attribute("transcode.path", self.path)
+            span.set_attribute("transcode.media_type", self.type)
+            span.set_attribute("transcode.segments", count)
+            try:
+                with open(list_path, "w") as file:
+                    for index in range(count):
+                        segment = self._segment_path(index).replace("'", "'\\''")
+                        file.write(f"file '{segment}'\n")
+                args = self._ffmpeg_args() + [
+                    "-f",
+                    "concat",
+                    "-safe",
+                    "0",
+                    "-i",
+                    list_path,
+                    "-i",
+                    source,
+                    "-map",
+                    "0:v",
+                    "-map",
+                    "1:a?",
+                ]
+                if "c:s" in params:
+                    args += self._subtitle_map_args(input_index=1)
+                for flag, value in concat_params(params).items():
+                    args += ["-" + flag, value]
+                args += ["-f", self.TARGET_EXTENSION, output_path]
+                self._run_ffmpeg(args, Stage.REMUX, self._duration(), "copy")
+                self._finish(source, output_path, final_path, encoder)
+            except BaseException as exc:
+                self._record_failure(span, exc)
+                self._count("failed", encoder)
+                remove(Path(output_path))
+                raise
+            finally:
+                self.discard_segments(count)
+            span.set_attribute("transcode.success", True)
+            self._log(f"Successfully Transcoded from {count} segments")
+            self._count("encoded", encoder)
+        self._record_decision(final_path, TranscodeDecision.TRANSCODED, params)
+
     @classmethod
-    def transcode_from_path(cls, path: str, video_type: str | None = None) -> bool:
+    def from_path(
+        cls,
+        path: str,
+        video_type: str | None = None,
+        probe_cache: ProbeCache | None = None,
+        library_index: LibraryIndex | None = None,
+        on_progress: Callable[[Progress], None] | None = None,
+        staging: StagingCache | None = None,
+        time_left: Callable[[], float | None] | None = None,
+    ) -> "Video | None":
         if video_type is None:
-            video_type = get_video_type(path)
-        if video_type is None:
-            cls.LOGGER.error(f"Invalid path received: {path}")
-            return False
+            cls.LOGGER.error(f"No media library contains {path}")
+            return None
         cls.LOGGER.info(f"Received file {path}")
-        video = Video(path, video_type, indent="\t")
-        return video.transcode()
+        return Video(
+            path,
+            video_type,
+            indent="\t",
+            probe_cache=probe_cache,
+            library_index=library_index,
+            on_progress=on_progress,
+            staging=staging,
+            time_left=time_left,
+        )
@@ -0,0 +1,109 @@
+import asyncio
+import logging
+from pathlib import Path
+
+from dependency_injector import providers
+from dependency_injector.wiring import inject, Provide
+
+from domain.constants import MediaType
+from domain.media_type import MediaTypeResolver
+from domain.transcode import meets_target
+from interfaces.arr import ArrFile
+from interfaces.radarr import RadarrClient
+from interfaces.sonarr import SonarrClient
+from transcoder.dependencies import Dependencies
+
+logger = logging.getLogger(__name__)
+
+
+async def _movie_files(
+    radarr: RadarrClient, resolver: MediaTypeResolver
+) -> list[tuple[MediaType, ArrFile]]:
+    files = await radarr.get_movie_files()
+    logger.info(f"Radarr listed {len(files)} movie files")
+    return [
+        (resolver.resolve(file.path, default=MediaType.MOVIE), file) for file in files
+    ]
+
+
+async def _episode_files(
+    sonarr: SonarrClient, resolver: MediaTypeResolver
+) -> list[tuple[MediaType, ArrFile]]:
+    series = {series["id"]: series for series in await sonarr.get_series()}
+    files = await sonarr.get_episode_files(series)
+    logger.info(
+        f"Sonarr listed {sum(map(len, files.values()))} episode files"
+        f" across {len(series)} series"
+    )
+    episode_files = []
+    for series_id, series_files in files.items():
+        default = (
+            MediaType.ANIMATION
+            if series[series_id]["seriesType"] == "anime"
+            else MediaType.TV
+        )
+        media_type = resolver.resolve(Path(series[series_id]["path"]), default=default)
+        episode_files += [(media_type, file) for file in series_files]
+    return episode_files
+
+
+@inject
+async def arr_library(
+    movies: bool = True,
+    series: bool = True,
+    radarr: providers.Resource[RadarrClient] = Provide[
+        Dependencies.radarr_client.provider
+    ],
+    sonarr: providers.Resource[SonarrClient] = Provide[
+        Dependencies.sonarr_client.provider
+    ],
+    resolver: MediaTypeResolver = Provide[Dependencies.media_type_resolver],
+) -> list[tuple[MediaType, ArrFile]]:
+    """Every file Radarr and Sonarr know about, with its media type."""
+    libraries = []
+    # Only the clients this call needs are built
+    if movies:
+        libraries.append(_movie_files(await radarr.async_(), resolver))
+    if series:
+        libraries.append(_episode_files(await sonarr.async_(), resolver))
+    results = await asyncio.gather(*libraries)
+    return [file for files in results for file in files]
+
+
+@inject
+async def close_arr_clients(
+    radarr: providers.Resource[RadarrClient] = Provide[
+        Dependencies.radarr_client.provider
+    ],
+    sonarr: providers.Resource[SonarrClient] = Provide[
+        Dependencies.sonarr_client.provider
+    ],
+) -> None:
+    """Close whichever arr clients were built, on the loop that used them."""
+    for client in (radarr, sonarr):
+        if client.initialized and (closing := client.shutdown()) is not None:
+            await closing
+
+
+def _meets_target(media_type: MediaType, file: ArrFile) -> bool:
+    # Files the arr couldn't analyse are left for ffprobe to decide
+    if file.width is None or file.bit_rate is None:
+        return False
+    return meets_target(file.path.suffix, media_type, file.width, file.bit_rate)
+
+
+async def arr_files_to_convert(
+    movies: bool = True, series: bool = True
+) -> list[tuple[Path, MediaType]]:
+    """Library files that the arr's own media info doesn't already rule out."""
+    files = await arr_library(movies, series)
+    remaining = [
+        (file.path, media_type)
+        for media_type, file in files
+        if not _meets_target(media_type, file)
+    ]
+    logger.info(
+        f"Skipped {len(files) - len(remaining)} of {len(files)} files"
+        " that already meet their target"
+    )
+    return remaining
@@ -0,0 +1,26 @@
+import logging
+from collections.abc import Iterable, Iterator
+
+from dependency_injector.wiring import inject, Provide
+
+from interfaces.library_index import LibraryIndex
+from interfaces.scanner import ScannedFile
+from transcoder.dependencies import Dependencies
+
+logger = logging.getLogger(__name__)
+
+
+@inject
+def changed_files[T](
+    files: Iterable[tuple[T, ScannedFile]],
+    library_index: LibraryIndex = Provide[Dependencies.library_index],
+) -> Iterator[tuple[T, ScannedFile]]:
+    """Drop files whose identity matches the one their last decision was made on."""
+    indexed = library_index.identities()
+    unchanged = 0
+    for key, file in files:
+        if indexed.get(file.path) == file.identity:
+            unchanged += 1
+            continue
+        yield key, file
+    logger.info(f"Skipped {unchanged} unchanged files")
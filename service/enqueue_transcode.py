@@ -1,11 +1,14 @@
 import logging
+from collections.abc import Iterable
 from pathlib import Path
 
 from dependency_injector.wiring import inject, Provide
 
-from domain.constants import MediaType
+from domain.constants import MediaType, Priority
+from domain.media_type import MediaTypeResolver
 from interfaces.rq import RQClient
 from transcoder.dependencies import Dependencies
+from transcoder.settings import settings
 
 logger = logging.getLogger(__name__)
 
@@ -14,7 +17,22 @@ logger = logging.getLogger(__name__)
 def enqueue_transcode(
     video_path: Path,
     media_type: MediaType | None = None,
+    priority: Priority = Priority.NORMAL,
     rq_client: RQClient = Provide[Dependencies.rq_client],
+    resolver: MediaTypeResolver = Provide[Dependencies.media_type_resolver],
 ) -> None:
     logger.info(f"Enqueueing transcode for {video_path}")
-    rq_client.enqueue_transcode(video_path, media_type)
+    if media_type is None:
+        media_type = resolver.resolve(video_path.absolute())
+    rq_client.enqueue_transcode(video_path, media_type, priority)
+
+
+@inject
+def enqueue_transcodes(
+    videos: Iterable[tuple[Path, MediaType | None]],
+    rq_client: RQClient = Provide[Dependencies.rq_client],
+) -> None:
+    enqueued = rq_client.enqueue_transcodes(
+        videos, batch_size=settings.enqueue_batch_size
+    )
+    logger.info(f"Enqueued {enqueued} transcodes")
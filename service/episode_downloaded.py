@@ -1,11 +1,33 @@
 import logging
 from pathlib import Path
 
-from service.enqueue_transcode import enqueue_transcode
+from dependency_injector.wiring import inject, Provide
+
+from domain.constants import MediaType
+from domain.media_type import MediaTypeResolver
+from interfaces.ingest_buffer import IngestBuffer
+from transcoder.dependencies import Dependencies
 
 logger = logging.getLogger(__name__)
 
 
-async def episode_downloaded(episode_path: Path) -> None:
+@inject
+async def episode_downloaded(
+    episode_path: Path,
+    series_path: Path | None,
+    series_type: str | None,
+    deleted_paths: list[Path],
+    ingest_buffer: IngestBuffer = Provide[Dependencies.ingest_buffer],
+    resolver: MediaTypeResolver = Provide[Dependencies.media_type_resolver],
+) -> None:
     logger.info(f"Received download notification for Sonarr episode {episode_path}")
-    enqueue_transcode(episode_path)
+    # A season pack arrives as one webhook per episode; batch them per series
+    group = series_path if series_path is not None else episode_path.parent
+    # The library root decides; Sonarr's series type only covers unknown roots
+    default = MediaType.ANIMATION if series_type == "anime" else MediaType.TV
+    ingest_buffer.add(
+        episode_path,
+        group=group,
+        media_type=resolver.resolve(group, default=default),
+        replaces=deleted_paths,
+    )
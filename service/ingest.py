@@ -0,0 +1,18 @@
+from dependency_injector.wiring import inject, Provide
+
+from interfaces.ingest_buffer import IngestBuffer
+from transcoder.dependencies import Dependencies
+
+
+@inject
+def start_ingest(
+    ingest_buffer: IngestBuffer = Provide[Dependencies.ingest_buffer],
+) -> None:
+    ingest_buffer.start()
+
+
+@inject
+async def stop_ingest(
+    ingest_buffer: IngestBuffer = Provide[Dependencies.ingest_buffer],
+) -> None:
+    await ingest_buffer.aclose()
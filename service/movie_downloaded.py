@@ -1,13 +1,27 @@
 import logging
 from pathlib import Path
 
+from dependency_injector.wiring import inject, Provide
 
-from service.enqueue_transcode import enqueue_transcode
-
+from domain.constants import MediaType
+from domain.media_type import MediaTypeResolver
+from interfaces.ingest_buffer import IngestBuffer
+from transcoder.dependencies import Dependencies
 
 logger = logging.getLogger(__name__)
 
 
-async def movie_downloaded(movie_path: Path) -> None:
+@inject
+async def movie_downloaded(
+    movie_path: Path,
+    deleted_paths: list[Path],
+    ingest_buffer: IngestBuffer = Provide[Dependencies.ingest_buffer],
+    resolver: MediaTypeResolver = Provide[Dependencies.media_type_resolver],
+) -> None:
     logger.info(f"Received download notification for Radarr movie {movie_path}")
-    enqueue_transcode(movie_path)
+    ingest_buffer.add(
+        movie_path,
+        group=movie_path.parent,
+        media_type=resolver.resolve(movie_path, default=MediaType.MOVIE),
+        replaces=deleted_paths,
+    )
@@ -0,0 +1,64 @@
+import itertools
+import statistics
+from collections import defaultdict
+from collections.abc import Iterable, Sequence
+
+from dependency_injector.wiring import inject, Provide
+
+from domain.constants import OrderingPolicy
+from interfaces.ffprobe import get_cached_video_info
+from interfaces.probe_cache import ProbeCache
+from interfaces.scanner import ScannedFile
+from transcoder.dependencies import Dependencies
+
+
+def _estimate_costs(
+    files: Sequence[ScannedFile], probe_cache: ProbeCache
+) -> list[float]:
+    # Cost is duration x pixel count for files the probe cache already knows.
+    # Unprobed files are costed by size, scaled by the median cost per byte
+    # of the probed ones so both kinds sort on the same axis.
+    costs: list[float | None] = []
+    for file in files:
+        info = get_cached_video_info(file.identity, probe_cache)
+        if info is None or info.duration is None:
+            costs.append(None)
+        else:
+            costs.append(info.duration * info.width * info.height)
+    ratios = [
+        cost / file.identity.size
+        for cost, file in zip(costs, files)
+        if cost is not None and file.identity.size
+    ]
+    cost_per_byte = statistics.median(ratios) if ratios else 1.0
+    return [
+        cost if cost is not None else file.identity.size * cost_per_byte
+        for cost, file in zip(costs, files)
+    ]
+
+
+@inject
+def order_files[T](
+    files: Iterable[tuple[T, ScannedFile]],
+    policy: OrderingPolicy,
+    probe_cache: ProbeCache = Provide[Dependencies.probe_cache],
+) -> Iterable[tuple[T, ScannedFile]]:
+    """Order a bulk enqueue. Every policy except scan order waits for the full scan."""
+    if policy == OrderingPolicy.SCAN:
+        return files
+    if policy == OrderingPolicy.ROUND_ROBIN:
+        libraries: defaultdict[T, list[tuple[T, ScannedFile]]] = defaultdict(list)
+        for key, file in files:
+            libraries[key].append((key, file))
+        return [
+            item
+            for items in itertools.zip_longest(*libraries.values())
+            for item in items
+            if item is not None
+        ]
+
+    items = list(files)
+    if policy == OrderingPolicy.SMALLEST_FIRST:
+        return sorted(items, key=lambda item: item[1].identity.size)
+    costs = _estimate_costs([file for _, file in items], probe_cache)
+    return [item for _, item in sorted(zip(costs, items), key=lambda pair: pair[0])]
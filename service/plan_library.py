@@ -0,0 +1,45 @@
+import logging
+from collections.abc import Iterable
+
+import numpy as np
+from dependency_injector.wiring import inject, Provide
+
+from domain.constants import MediaType
+from domain.plan import LibraryColumns, PlanSummary, summarize
+from interfaces.ffprobe import cached_video_fields
+from interfaces.probe_cache import ProbeCache
+from interfaces.scanner import ScannedFile
+from transcoder.dependencies import Dependencies
+
+logger = logging.getLogger(__name__)
+
+
+@inject
+def plan_library(
+    files: Iterable[tuple[MediaType, ScannedFile]],
+    probe_cache: ProbeCache = Provide[Dependencies.probe_cache],
+) -> tuple[dict[MediaType, PlanSummary], int]:
+    """Plan scanned files from their cached probes, and count files without one."""
+    probes = cached_video_fields(probe_cache)
+    media_types, extensions, widths, bit_rates, durations = [], [], [], [], []
+    unprobed = 0
+    for media_type, file in files:
+        probe = probes.get(file.identity)
+        if probe is None or probe[0] is None or probe[1] is None:
+            unprobed += 1
+            continue
+        width, bit_rate, duration = probe
+        media_types.append(media_type)
+        extensions.append(file.path.suffix)
+        widths.append(width)
+        bit_rates.append(bit_rate)
+        durations.append(duration if duration is not None else np.nan)
+    logger.info(f"Planning {len(media_types)} files, {unprobed} without a probe")
+    columns = LibraryColumns(
+        media_types=np.array(media_types, dtype=str),
+        extensions=np.array(extensions, dtype=str),
+        widths=np.array(widths, dtype=np.int64),
+        bit_rates=np.array(bit_rates, dtype=np.int64),
+        durations=np.array(durations, dtype=np.float64),
+    )
+    return summarize(columns), unprobed
@@ -1,14 +1,204 @@
 import logging
+import sqlite3
 from pathlib import Path
 
-from domain.constants import MediaType
+from dependency_injector.wiring import inject, Provide
+
+from domain.constants import MediaType, Priority
+from domain.media_type import MediaTypeResolver
+from domain.transcode import stage_for
+from interfaces.fingerprint import fingerprint
+from interfaces.library_index import LibraryIndex
+from interfaces.probe_cache import ProbeCache
+from interfaces.result_store import ResultStore
+from interfaces.rq import (
+    RQClient,
+    dependency_encoders,
+    job_time_left,
+    publish_progress,
+    record_encoder,
+    record_failure,
+)
+from interfaces.staging import StagingCache, prefetch
 from interfaces.transcoder import Video
+from transcoder.dependencies import Dependencies
+from transcoder.settings import settings
 
 logger = logging.getLogger(__name__)
 
 
-def transcode_file(path: Path, media_type: MediaType | None = None) -> None:
+def _fingerprint(path: Path) -> str | None:
+    try:
+        return fingerprint(path)
+    except OSError:
+        logger.warning("Unable to fingerprint %s", path, exc_info=True)
+        return None
+
+
+def _record_result(
+    result_store: ResultStore,
+    source_fingerprint: str | None,
+    video: Video,
+    params: dict[str, str] | None,
+) -> None:
+    # Only planned params can be compared with a later job's
+    if source_fingerprint is None or params is None:
+        return
+    try:
+        result_store.put(source_fingerprint, Path(video.final_path), params)
+    except (OSError, sqlite3.Error):
+        logger.warning("Unable to record result for %s", video.path, exc_info=True)
+
+
+def _reuse_result(
+    result_store: ResultStore,
+    source_fingerprint: str | None,
+    video: Video,
+    params: dict[str, str],
+) -> bool:
+    # The same release elsewhere in the libraries may already be done
+    if source_fingerprint is None:
+        return False
+    result = result_store.get(source_fingerprint)
+    if result is None or result[1] != params:
+        return False
+    video.reuse(result[0], params)
+    return True
+
+
+@inject
+def probe_file(
+    path: Path,
+    media_type: MediaType | None = None,
+    priority: Priority = Priority.NORMAL,
+    probe_cache: ProbeCache = Provide[Dependencies.probe_cache],
+    library_index: LibraryIndex = Provide[Dependencies.library_index],
+    rq_client: RQClient = Provide[Dependencies.rq_client],
+    resolver: MediaTypeResolver = Provide[Dependencies.media_type_resolver],
+    result_store: ResultStore = Provide[Dependencies.result_store],
+) -> None:
+    video = Video.from_path(
+        str(path),
+        video_type=media_type or resolver.resolve(path),
+        probe_cache=probe_cache,
+        library_index=library_index,
+    )
+    params = video.plan() if video is not None else None
+    if video is None or params is None:
+        rq_client.release(path)
+        return
+    if segments := video.segments(params):
+        # Checked here, as no single segment or join job can reuse the output
+        if _reuse_result(result_store, _fingerprint(path), video, params):
+            rq_client.release(path)
+            return
+        logger.info(f"Splitting {path} into {len(segments)} segments")
+        rq_client.enqueue_segments(
+            path, MediaType(video.type), params, segments, priority
+        )
+        return
+    stage = stage_for(params)
+    logger.info(f"Routing {path} to the {stage} queue")
+    rq_client.enqueue_stage(stage, path, MediaType(video.type), params, priority)
+
+
+@inject
+def transcode_file(
+    path: Path,
+    media_type: MediaType | None = None,
+    params: dict[str, str] | None = None,
+    probe_cache: ProbeCache = Provide[Dependencies.probe_cache],
+    library_index: LibraryIndex = Provide[Dependencies.library_index],
+    resolver: MediaTypeResolver = Provide[Dependencies.media_type_resolver],
+    rq_client: RQClient = Provide[Dependencies.rq_client],
+    staging: StagingCache | None = Provide[Dependencies.staging_cache],
+    result_store: ResultStore = Provide[Dependencies.result_store],
+) -> None:
+    if staging is not None and params is not None:
+        # Copy the next sources to local disk while this one encodes
+        prefetch(rq_client.peek_paths(stage_for(params), settings.staging_lookahead))
     # TODO: This should be refactored so that:
     #  - FFMPEG, FFPROBE and File Operations should be interfaces
     #  - FFMPEG settings should be domain functions
-    Video.transcode_from_path(str(path), video_type=media_type)
+    video = Video.from_path(
+        str(path),
+        video_type=media_type or resolver.resolve(path),
+        probe_cache=probe_cache,
+        library_index=library_index,
+        on_progress=publish_progress,
+        staging=staging,
+        time_left=job_time_left,
+    )
+    if video is None:
+        return
+    # Fingerprinted before the transcode, which removes the source
+    source_fingerprint = _fingerprint(path)
+    if params is not None and _reuse_result(
+        result_store, source_fingerprint, video, params
+    ):
+        return
+    if video.transcode(params=params):
+        _record_result(result_store, source_fingerprint, video, params)
+    elif video.failure_reason is not None:
+        record_failure(video.failure_reason)
+
+
+@inject
+def encode_segment(
+    path: Path,
+    media_type: MediaType,
+    params: dict[str, str],
+    index: int,
+    start: float,
+    end: float | None,
+    probe_cache: ProbeCache = Provide[Dependencies.probe_cache],
+    staging: StagingCache | None = Provide[Dependencies.staging_cache],
+) -> None:
+    video = Video(
+        str(path),
+        media_type,
+        indent="\t",
+        probe_cache=probe_cache,
+        on_progress=publish_progress,
+        time_left=job_time_left,
+        staging=staging,
+    )
+    try:
+        record_encoder(video.encode_segment(index, start, end, params))
+    finally:
+        if video.failure_reason is not None:
+            record_failure(video.failure_reason)
+
+
+@inject
+def concat_segments(
+    path: Path,
+    media_type: MediaType,
+    params: dict[str, str],
+    count: int,
+    probe_cache: ProbeCache = Provide[Dependencies.probe_cache],
+    library_index: LibraryIndex = Provide[Dependencies.library_index],
+    staging: StagingCache | None = Provide[Dependencies.staging_cache],
+    result_store: ResultStore = Provide[Dependencies.result_store],
+) -> None:
+    video = Video(
+        str(path),
+        media_type,
+        indent="\t",
+        probe_cache=probe_cache,
+        library_index=library_index,
+        on_progress=publish_progress,
+        time_left=job_time_left,
+        staging=staging,
+    )
+    if (encoders := dependency_encoders()) is None:
+        video.abandon_segments(count)
+    # Segments can be encoded on nodes with different encoders
+    encoder = encoders[0] if len(set(encoders)) == 1 else "mixed"
+    source_fingerprint = _fingerprint(path)
+    try:
+        video.concat_segments(count, params, encoder)
+        _record_result(result_store, source_fingerprint, video, params)
+    finally:
+        if video.failure_reason is not None:
+            record_failure(video.failure_reason)
@@ -1,18 +1,105 @@
+from pathlib import Path
+
 from dependency_injector import providers
 from dependency_injector.containers import DeclarativeContainer
+from redis import Redis
+from redis.asyncio import BlockingConnectionPool
+from redis.asyncio import Redis as AsyncRedis
 
-from interfaces.rq import RQClient
+from domain.media_type import MediaTypeResolver
+from interfaces import staging
+from interfaces.arr import arr_client
+from interfaces.ingest_buffer import IngestBuffer
+from interfaces.library_index import LibraryIndex
+from interfaces.probe_cache import ProbeCache
+from interfaces.result_store import ResultStore
+from interfaces.radarr import RadarrClient
+from interfaces.rq import AsyncRQClient, RQClient
+from interfaces.sonarr import SonarrClient
 from transcoder.settings import settings
 
 
 class Dependencies(DeclarativeContainer):
     settings = providers.Configuration(pydantic_settings=[settings])
 
+    redis = providers.Singleton(
+        Redis,
+        host=settings.redis_host,
+        port=settings.redis_port,
+    )
+
     rq_client = providers.Singleton(
         RQClient,
-        redis_url=settings.redis_host,
-        redis_port=settings.redis_port,
+        connection=redis,
         timeout=settings.transcode_timeout,
+        probe_timeout=settings.probe_timeout,
+        inflight_ttl=settings.inflight_ttl,
+    )
+
+    async_redis = providers.Singleton(
+        AsyncRedis,
+        connection_pool=providers.Singleton(
+            BlockingConnectionPool,
+            host=settings.redis_host,
+            port=settings.redis_port,
+            max_connections=settings.redis_max_connections,
+        ),
+    )
+
+    async_rq_client = providers.Singleton(
+        AsyncRQClient,
+        connection=async_redis,
+        rq_client=rq_client,
+        inflight_ttl=settings.inflight_ttl,
+    )
+
+    ingest_buffer = providers.Singleton(
+        IngestBuffer,
+        rq_client=async_rq_client,
+        debounce=settings.webhook_debounce,
+        max_delay=settings.webhook_max_delay,
+    )
+
+    media_type_resolver = providers.Singleton(
+        MediaTypeResolver,
+        libraries=settings.media_libraries,
+    )
+
+    # Built on first use and shared from then on; close_arr_clients closes them
+    radarr_client = providers.Resource(
+        arr_client,
+        RadarrClient,
+        base_url=settings.radarr_url,
+        api_key=settings.radarr_api_key,
+        max_connections=settings.arr_max_connections,
+        cache_ttl=settings.arr_cache_ttl,
+    )
+
+    sonarr_client = providers.Resource(
+        arr_client,
+        SonarrClient,
+        base_url=settings.sonarr_url,
+        api_key=settings.sonarr_api_key,
+        max_connections=settings.arr_max_connections,
+        cache_ttl=settings.arr_cache_ttl,
+    )
+
+    # None unless staging_dir is set
+    staging_cache = providers.Singleton(staging.staging_cache)
+
+    probe_cache = providers.Singleton(
+        ProbeCache,
+        path=providers.Callable(Path.joinpath, settings.cache_dir, "probe.sqlite3"),
+    )
+
+    library_index = providers.Singleton(
+        LibraryIndex,
+        path=providers.Callable(Path.joinpath, settings.cache_dir, "library.sqlite3"),
+    )
+
+    result_store = providers.Singleton(
+        ResultStore,
+        path=providers.Callable(Path.joinpath, settings.cache_dir, "results.sqlite3"),
     )
 
 
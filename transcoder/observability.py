@@ -1,4 +1,5 @@
 import logging
+import threading
 
 from fastapi import FastAPI
 from opentelemetry import metrics, trace
@@ -55,6 +56,35 @@ def configure_telemetry() -> None:
     )
 
 
+def _force_flush(timeout_millis: int) -> None:
+    try:
+        tracer_provider = trace.get_tracer_provider()
+        if isinstance(tracer_provider, TracerProvider):
+            tracer_provider.force_flush(timeout_millis)
+        meter_provider = metrics.get_meter_provider()
+        if isinstance(meter_provider, MeterProvider):
+            meter_provider.force_flush(timeout_millis)
+    except Exception:
+        logger.warning("Unable to flush telemetry", exc_info=True)
+
+
+def flush_telemetry(timeout: float | None = None) -> None:
+    """Export buffered spans and metrics, waiting at most timeout seconds.
+
+    RQ work horses leave with os._exit(), which skips the providers' own
+    shutdown, so anything recorded during a job must be flushed before then.
+    An export in progress ignores force_flush's timeout and retries on its own
+    schedule, so the flush runs on a daemon thread that is abandoned once the
+    timeout passes; an unreachable collector costs a job seconds, not minutes.
+    """
+    timeout = timeout if timeout is not None else settings.otel_flush_timeout
+    flusher = threading.Thread(
+        target=_force_flush, args=(int(timeout * 1000),), daemon=True
+    )
+    flusher.start()
+    flusher.join(timeout)
+
+
 def instrument_fastapi(app: FastAPI) -> None:
     """Instrument a FastAPI app instance. Call after app creation."""
     FastAPIInstrumentor.instrument_app(app)
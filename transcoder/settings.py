@@ -1,19 +1,114 @@
+import tempfile
+from pathlib import Path
+from typing import Literal
+
+from pydantic import field_validator
 from pydantic_settings import BaseSettings
 
+from domain.constants import MediaType
+
 
 class Settings(BaseSettings):
     # Transcode
     transcode_timeout: int = 20000
+    probe_timeout: int = 600
+    # ffmpeg gets time_factor x the media duration, within these bounds in seconds
+    transcode_time_factor: float = 4.0
+    transcode_min_time: int = 300
+    # Typical encode speed as a multiple of real time, for the plan command
+    plan_encode_speed: float = 1.0
+    ffprobe_time_limit: int = 120
+    # Seconds between SIGTERM and SIGKILL when stopping ffmpeg or ffprobe
+    kill_grace_period: float = 10
     puid: int = 13015
     pgid: int = 13000
+    # SQLite stores read and written by the CLI, API and every worker, so it must
+    # be an absolute path that all of them mount at the same place
+    cache_dir: Path = Path("/data/transcoder")
+    # Local disk for ffmpeg output, copied next to the source once complete
+    scratch_dir: Path | None = None
+    # Local disk for read-ahead copies of upcoming sources, and its size in bytes
+    staging_dir: Path | None = None
+    staging_budget: int = 200 * 1024**3
+    # Queued jobs per stage whose sources are staged ahead of time
+    staging_lookahead: int = 2
+    ffmpeg_binary: str = "ffmpeg"
+    ffprobe_binary: str = "ffprobe"
+    # Encoder preference order; the first one this node can run is used
+    encoders: list[str] = ["hevc_nvenc", "hevc_qsv", "hevc_vaapi", "libx265"]
+    # Seconds each encoder check may take before the encoder counts as unusable
+    encoder_check_timeout: float = 30
+    # Concurrent ffmpeg processes per node by kind, 0 for no limit
+    encode_slots: int = 3
+    copy_slots: int = 4
+    # Node-local directory for the slot lock files; never a shared mount, where
+    # flock() would make the slot limits cluster-wide
+    lock_dir: Path = Path(tempfile.gettempdir()) / "transcoder"
+    # Image-based subtitles (PGS, VobSub) can't be converted to mov_text
+    image_subtitles: Literal["drop", "extract"] = "drop"
+    # Seconds between ffmpeg progress reports, and without output progress before a job is killed
+    progress_interval: float = 5
+    transcode_stall_timeout: int = 300
+    # Movies at least this many seconds long are encoded as this many segments on
+    # separate workers, then joined; 1 encodes every file whole
+    segment_count: int = 1
+    segment_min_duration: float = 3600
+
+    # FFprobe (unset reads as far as FFprobe's defaults)
+    ffprobe_probesize: int | None = None
+    ffprobe_analyzeduration: int | None = None
+
+    # Library roots and the media type of everything under them
+    media_libraries: dict[Path, MediaType] = {
+        Path("/data/media/TV Shows"): MediaType.TV,
+        Path("/data/media/Movies"): MediaType.MOVIE,
+        Path("/data/media/Animated TV Shows"): MediaType.ANIMATION,
+    }
+
+    # Library scanning
+    scan_workers: int = 16
+
+    # Worker pool sizes per stage
+    probe_workers: int = 2
+    remux_workers: int = 2
+    encode_workers: int = 1
 
     # Redis
     redis_host: str = "redis"
     redis_port: int = 6379
+    # Pool size for the API's asyncio Redis client; requests wait for a free connection
+    redis_max_connections: int = 32
+    enqueue_batch_size: int = 500
+    # Upper bound on how long a path stays marked in flight if its job never reports back
+    inflight_ttl: int = 3 * 24 * 60 * 60
+
+    # Webhooks: seconds an import waits for more from the same folder, and at most
+    webhook_debounce: float = 30
+    webhook_max_delay: float = 300
+
+    # Radarr and Sonarr APIs
+    radarr_url: str = "http://radarr:7878"
+    radarr_api_key: str = ""
+    sonarr_url: str = "http://sonarr:8989"
+    sonarr_api_key: str = ""
+    # Concurrent requests per client, and how long responses are reused in seconds
+    arr_max_connections: int = 8
+    arr_cache_ttl: float = 300
 
     # OpenTelemetry
     otel_service_name: str = "transcoder"
     otel_exporter_endpoint: str = "http://alloy:4318"
+    # Seconds a work horse spends exporting telemetry after each job, at most
+    otel_flush_timeout: float = 2
+
+    @field_validator("cache_dir")
+    @classmethod
+    def _absolute(cls, path: Path) -> Path:
+        # A relative path resolves per working directory, silently giving each
+        # process its own empty stores
+        if not path.is_absolute():
+            raise ValueError(f"must be an absolute path, not {path}")
+        return path
 
 
 settings = Settings()
@@ -3,25 +3,151 @@
 Preloads logging, OpenTelemetry, and dependency injection *before* the
 worker's fetch-fork-execute loop so every forked job process inherits
 the fully-configured environment without paying the setup cost each time.
+
+Usage: ``python worker.py [probe|remux|encode ...] [--concurrency N]``
+(defaults to every stage). Each stage gets its own pool of worker processes,
+sized by the ``<stage>_workers`` settings, and every worker drains its
+stage's high-priority queue before the normal one.
+
+With ``--concurrency N`` the node instead runs N job slots that each serve
+every requested stage. ffmpeg runs are then limited by the ``encode_slots``
+and ``copy_slots`` settings rather than by which queue a worker listens on.
+
+Workers that exit on their own are restarted, after a delay that doubles with
+each quick failure. Encode workers also drain the pre-stage ``default`` queue.
 """
 
+import argparse
+import logging
+import multiprocessing
+import os
+import signal
+import time
+from multiprocessing.process import BaseProcess
+from types import FrameType
+
 from redis import Redis
-from rq import Worker
+from rq import Queue, Worker
+from rq.job import Job
 
+from domain.constants import Priority, Stage
+from interfaces.rq import LEGACY_QUEUE, queue_name
 from transcoder.events import on_startup, on_shutdown
+from transcoder.observability import flush_telemetry
 from transcoder.settings import settings
 
 # Preload: configure logging, OpenTelemetry, and DI
 on_startup()
 
 # Preload heavy job dependencies so they are already imported before fork
+import interfaces.encoders  # noqa: E402
 import interfaces.transcoder  # noqa: E402, F401
 import service.transcode  # noqa: E402, F401
 
-w = Worker(
-    ["default"],
-    connection=Redis(host=settings.redis_host, port=settings.redis_port),
-)
-w.work()
+logger = logging.getLogger(__name__)
+
+# A worker that dies sooner than this after starting waits before its restart,
+# twice as long each time, up to the maximum
+_HEALTHY_RUNTIME = 60.0
+_MAX_RESTART_DELAY = 60.0
+
+POOL_SIZES = {
+    Stage.PROBE: settings.probe_workers,
+    Stage.REMUX: settings.remux_workers,
+    Stage.ENCODE: settings.encode_workers,
+}
+
+
+class FlushingWorker(Worker):
+    def perform_job(self, job: Job, queue: Queue) -> bool:
+        # Runs in the work horse, which exits without flushing telemetry
+        try:
+            return super().perform_job(job, queue)
+        finally:
+            flush_telemetry()
+
+
+def work(stages: list[Stage]) -> None:
+    # Forked from the supervisor, whose handlers only set stop_signal
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    queues = [queue_name(stage, priority) for priority in Priority for stage in stages]
+    if Stage.ENCODE in stages:
+        queues.append(LEGACY_QUEUE)
+    w = FlushingWorker(
+        queues,
+        connection=Redis(host=settings.redis_host, port=settings.redis_port),
+    )
+    w.work()
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument("stages", nargs="*", type=Stage, default=list(Stage))
+parser.add_argument("--concurrency", type=int)
+args = parser.parse_args()
+
+if Stage.ENCODE in args.stages:
+    # Detect the encoder once here rather than in every forked work horse
+    interfaces.encoders.select_encoder()
+
+context = multiprocessing.get_context("fork")
+if args.concurrency is None:
+    pool = {
+        f"worker-{stage}-{i}": [stage]
+        for stage in args.stages
+        for i in range(POOL_SIZES[stage])
+    }
+else:
+    pool = {f"worker-{i}": args.stages for i in range(args.concurrency)}
+
+
+def spawn(name: str) -> BaseProcess:
+    process = context.Process(target=work, args=(pool[name],), name=name)
+    process.start()
+    return process
+
+
+processes = {name: spawn(name) for name in pool}
+started = dict.fromkeys(pool, time.monotonic())
+quick_failures = dict.fromkeys(pool, 0)
+restart_at: dict[str, float] = {}
+stop_signal: int | None = None
+
+
+def stop(signum: int, frame: FrameType | None) -> None:
+    global stop_signal
+    stop_signal = signum
+
+
+signal.signal(signal.SIGTERM, stop)
+signal.signal(signal.SIGINT, stop)
+while stop_signal is None:
+    now = time.monotonic()
+    for name, process in processes.items():
+        if process.is_alive():
+            continue
+        if name not in restart_at:
+            if now - started[name] >= _HEALTHY_RUNTIME:
+                quick_failures[name] = 0
+            delay = min(2.0 ** quick_failures[name], _MAX_RESTART_DELAY)
+            quick_failures[name] += 1
+            logger.warning(
+                f"{name} exited with code {process.exitcode}, restarting in {delay:.0f}s"
+            )
+            restart_at[name] = now + delay
+        elif now >= restart_at[name]:
+            del restart_at[name]
+            processes[name] = spawn(name)
+            started[name] = now
+    time.sleep(1)
+
+# Each RQ worker handles SIGTERM itself as a warm shutdown; Ctrl+C already
+# reached every worker through the process group
+if stop_signal == signal.SIGTERM:
+    for process in processes.values():
+        if process.pid is not None and process.is_alive():
+            os.kill(process.pid, signal.SIGTERM)
+for process in processes.values():
+    process.join()
 
 on_shutdown()